@@ -35,16 +35,12 @@ HTTP_204_NO_CONTENT = 204
 def step_impl(context):
     """ Delete all Products and load new ones """
     #
-    # List all of the products and delete them one by one
+    # Delete all of the products with a single request
     #
     rest_endpoint = f"{context.base_url}/products"
-    context.resp = requests.get(rest_endpoint)
-    assert(context.resp.status_code == HTTP_200_OK)
-    for product in context.resp.json():
-        context.resp = requests.delete(f"{rest_endpoint}/{product['id']}")
-        # assert(context.resp.status_code == HTTP_204_NO_CONTENT)
-        assert context.resp.status_code == HTTP_204_NO_CONTENT, \
-            f"Expected 204 but got {context.resp.status_code}: {context.resp.text}"
+    context.resp = requests.delete(rest_endpoint)
+    assert context.resp.status_code == HTTP_204_NO_CONTENT, \
+        f"Expected 204 but got {context.resp.status_code}: {context.resp.text}"
 
     #
     # load the database with new products
@@ -0,0 +1,104 @@
+######################################################################
+# Copyright 2016, 2022 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Gunicorn configuration for the Product service
+
+Gunicorn reads this file from the working directory, or use
+``gunicorn --config gunicorn.conf.py service:app``. Every setting can be
+overridden from the environment.
+
+Each worker has its own database connection pool of DB_POOL_SIZE plus
+DB_MAX_OVERFLOW connections, so keep workers times that below the
+database's connection limit and threads at or below DB_POOL_SIZE.
+"""
+import multiprocessing
+import os
+import sys
+
+# The gthread worker serves requests from a thread pool in each worker.
+# gevent serves many concurrent requests per worker with greenlets.
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+
+# sync workers handle one request at a time, so run more of them
+_cores = multiprocessing.cpu_count()
+workers = int(os.getenv("GUNICORN_WORKERS", str(_cores * 2 + 1 if worker_class == "sync" else _cores)))
+threads = int(os.getenv("GUNICORN_THREADS", "4" if worker_class == "gthread" else "1"))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "100"))
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8080')}")
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Restart workers after a while to contain memory growth. The jitter keeps
+# them from all restarting at the same time.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "1000"))
+
+# Load the app once in the master so workers fork with it already imported
+preload_app = os.getenv("GUNICORN_PRELOAD", "false").lower() == "true"
+
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+
+
+def on_starting(server):  # pylint: disable=unused-argument
+    """Gives the workers an empty directory to share their metrics in
+
+    PROMETHEUS_MULTIPROC_DIR must be set before gunicorn starts, and the
+    files of a previous run must be removed or /metrics would count them.
+    """
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith(".db"):
+            os.remove(os.path.join(directory, name))
+
+
+def post_fork(server, worker):  # pylint: disable=unused-argument
+    """Gives the new worker its own database connections
+
+    With preload_app the engine was created in the master and a forked
+    worker must never use a connection the master or another worker holds.
+    """
+    if worker_class == "gevent":
+        try:
+            # let psycopg2 yield to other greenlets while it waits on the database
+            from psycogreen.gevent import patch_psycopg  # pylint: disable=import-outside-toplevel
+
+            patch_psycopg()
+        except ImportError:
+            server.log.warning("psycogreen is not installed, database calls will block the gevent worker")
+    service = sys.modules.get("service")
+    if service is None:
+        return  # the app is imported after the fork, so nothing was inherited
+    with service.app.app_context():
+        # drop the inherited pools, including the replicas', without closing
+        # connections the master still owns
+        for engine in service.models.db.engines.values():
+            engine.dispose(close=False)
+
+
+def child_exit(server, worker):  # pylint: disable=unused-argument
+    """Removes the metrics of a worker that exited from /metrics"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess  # pylint: disable=import-outside-toplevel
+
+        multiprocess.mark_process_dead(worker.pid)
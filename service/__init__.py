@@ -24,7 +24,7 @@ and SQL database
 import sys
 from flask import Flask
 from service import config
-from service.common import log_handlers
+from service.common import compression, json_provider, log_handlers, metrics, profiler
 
 # NOTE: Do not change the order of this code
 # The Flask app must be created
@@ -36,6 +36,9 @@ app = Flask(__name__)  # pylint: disable=invalid-name
 # Load Configurations
 app.config.from_object(config)
 
+# Encode JSON with orjson when it is installed
+app.json = json_provider.FastJSONProvider(app)
+
 # Dependencies require we import the routes AFTER the Flask app is created
 # pylint: disable=wrong-import-position, wrong-import-order, cyclic-import
 from service import routes, models        # noqa: F401, E402
@@ -44,12 +47,22 @@ from service.common import error_handlers, cli_commands  # noqa: F401, E402
 # Set up logging for production
 log_handlers.init_logging(app, "gunicorn.error")
 
+# Count and time the SQL statements of every request
+profiler.init_profiler(app)
+
+# Record request, database and cache metrics at /metrics
+metrics.init_metrics(app, models.pool_stats, models.cache_stats)
+
+# Compress JSON responses. This must be set up after the metrics so that
+# it runs first and the metrics record the compressed size.
+compression.init_compression(app)
+
 app.logger.info(70 * "*")
 app.logger.info("  P E T   S E R V I C E   R U N N I N G  ".center(70, "*"))
 app.logger.info(70 * "*")
 
 try:
-    models.init_db(app)  # make our sqlalchemy tables
+    models.init_db(app)  # make our sqlalchemy tables if DB_CREATE_ON_STARTUP
 except Exception as error:  # pylint: disable=broad-except
     app.logger.critical("%s: Cannot continue", error)
     # gunicorn requires exit code 4 to stop spawning workers when they die
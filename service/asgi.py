@@ -0,0 +1,317 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+ASGI Entry Point
+
+Serves the Product API from an asyncio event loop using SQLAlchemy's
+AsyncSession, so that one worker can wait on many slow clients and
+database round trips at the same time. The Product model, its
+serialize() / deserialize(), the query building and the parsing of the
+query parameters and If-Match are shared with the Flask routes. Run it with an ASGI server, for example:
+
+    gunicorn -k uvicorn.workers.UvicornWorker service.asgi:application
+
+This needs an asyncio database driver: asyncpg for PostgreSQL or aiosqlite
+for SQLite. ASYNC_DATABASE_URI defaults to DATABASE_URI with that driver.
+"""
+import logging
+from urllib.parse import parse_qsl, urlencode
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm.exc import StaleDataError
+from werkzeug.exceptions import BadRequest, HTTPException, NotFound, PreconditionFailed, UnsupportedMediaType
+from werkzeug.http import parse_etags, quote_etag
+from werkzeug.routing import Map, Rule
+from service import app
+from service.common import status
+from service.common.arguments import get_cursor, get_filters, get_page_size, if_match_versions, version_etag
+from service.common.pagination import encode_cursor, keyset, parse_sort, sort_key
+from service.config import engine_options
+from service.models import DataConflictError, DataValidationError, Product, STATS_KEY
+
+logger = logging.getLogger("flask.app")
+
+# The asyncio driver for each database
+DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+JSON_MIMETYPE = "application/json"
+
+URLS = Map(strict_slashes=False)
+HANDLERS = {}
+
+
+def async_database_uri(uri: str) -> str:
+    """Returns a database URI that uses the asyncio driver for its database"""
+    scheme, _, rest = uri.partition("://")
+    return f"{DRIVERS.get(scheme.split('+')[0], scheme)}://{rest}"
+
+
+def async_engine_options(settings) -> dict:
+    """Returns engine_options() with the connect arguments asyncpg understands"""
+    options = engine_options(settings)
+    if "connect_args" in options:
+        options["connect_args"] = {
+            "timeout": settings["DB_CONNECT_TIMEOUT"],
+            "server_settings": {"statement_timeout": str(settings["DB_STATEMENT_TIMEOUT"])},
+        }
+    return options
+
+
+def route(rule, methods, database=True):
+    """Registers an async handler for a URL rule, like Flask's app.route
+
+    Handlers are called with the request, an AsyncSession, or None if
+    ``database`` is False, and the values of the URL rule
+    """
+
+    def decorator(handler):
+        URLS.add(Rule(rule, endpoint=handler.__name__, methods=methods))
+        HANDLERS[handler.__name__] = (handler, database)
+        return handler
+
+    return decorator
+
+
+class Request:
+    """The parts of an ASGI HTTP request that the handlers need"""
+
+    def __init__(self, scope: dict, body: bytes = b""):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.args = dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+        self.headers = {
+            name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope.get("headers", [])
+        }
+        self.body = body
+        self.urls = URLS.bind(self.headers.get("host", "localhost"), url_scheme=scope.get("scheme", "http"))
+
+    def get_json(self):
+        """Returns the JSON body or raises 415 if it is not JSON"""
+        if self.headers.get("content-type") != JSON_MIMETYPE:
+            raise UnsupportedMediaType(f"Content-Type must be {JSON_MIMETYPE}")
+        try:
+            return app.json.loads(self.body)
+        except ValueError as error:
+            raise BadRequest(f"Invalid JSON: {error}") from error
+
+    def url_for(self, endpoint: str, **values) -> str:
+        """Returns the external URL of an endpoint"""
+        return self.urls.build(endpoint, values, force_external=True)
+
+
+######################################################################
+#  U T I L I T Y   F U N C T I O N S
+######################################################################
+def not_found(product_id):
+    """Returns the error for a Product that does not exist"""
+    return NotFound(f"Product with id '{product_id}' was not found.")
+
+
+######################################################################
+#  P R O D U C T   H A N D L E R S
+######################################################################
+@route("/health", ["GET"], database=False)
+async def healthcheck(request, session):  # pylint: disable=unused-argument
+    """Let them know our heart is still beating"""
+    return {"status": 200, "message": "OK"}, status.HTTP_200_OK, {}
+
+
+@route("/products", ["GET"])
+async def list_products(request, session):
+    """Returns a page of Products
+
+    Takes the same filters, ``sort``, ``limit`` and ``cursor`` as the
+    Flask route, parsed by the same functions, and links the next page
+    the same way
+    """
+    logger.info("Request to list Products...")
+    args = request.args
+    query = Product.find_by_filters(**get_filters(args), query=select(Product))
+    sort = parse_sort(args.get("sort"))
+    headers = {}
+    limit = get_page_size(args, app.config)
+    page = keyset(query, sort, get_cursor(args)).limit(limit + 1)
+    products = (await session.scalars(page)).all()
+    if len(products) > limit:
+        products = products[:limit]
+        next_args = dict(args, cursor=encode_cursor(sort_key(products[-1], sort)), limit=limit)
+        headers["Link"] = f'<{request.url_for("list_products")}?{urlencode(next_args)}>; rel="next"'
+    logger.info("[%s] Products returned", len(products))
+    return [product.serialize() for product in products], status.HTTP_200_OK, headers
+
+
+@route("/products", ["POST"])
+async def create_products(request, session):
+    """Creates a Product from the data in the body that is posted"""
+    logger.info("Request to Create a Product...")
+    product = Product()
+    product.deserialize(request.get_json())
+    session.add(product)
+    await session.commit()
+    Product.cache.delete(STATS_KEY)
+    logger.info("Product with new id [%s] saved!", product.id)
+    location_url = request.url_for("get_products", product_id=product.id)
+    return product.serialize(), status.HTTP_201_CREATED, {"Location": location_url}
+
+
+@route("/products/<int:product_id>", ["GET"])
+async def get_products(request, session, product_id):  # pylint: disable=unused-argument
+    """Retrieves a single Product, through the Product cache"""
+    logger.info("Request to Retrieve a product with id [%s]", product_id)
+    data = Product.cache.get(str(product_id))
+    if data is None:
+        product = await session.get(Product, product_id)
+        if not product:
+            raise not_found(product_id)
+        data = product.serialize()
+        Product.cache.set(str(product_id), data)
+    return data, status.HTTP_200_OK, {"ETag": quote_etag(version_etag(data["version"]))}
+
+
+@route("/products/<int:product_id>", ["PUT"])
+async def update_products(request, session, product_id):
+    """Updates a Product from the body that is posted
+
+    Send the ETag of the Product in If-Match to only update that version
+    """
+    logger.info("Request to Update a product with id [%s]", product_id)
+    data = request.get_json()
+    product = await session.get(Product, product_id)
+    if not product:
+        raise not_found(product_id)
+    versions = if_match_versions(parse_etags(request.headers.get("if-match")))
+    if versions is not None and product.version not in versions:
+        # the client may have read a stale copy from this worker's cache
+        Product.cache.delete(str(product_id))
+        raise PreconditionFailed(f"Product with id '{product_id}' was changed by someone else")
+    product.deserialize(data)
+    product.id = product_id
+    try:
+        await session.commit()
+    except StaleDataError as error:
+        Product.cache.delete(str(product_id))
+        raise DataConflictError(f"Product with id '{product_id}' was changed by someone else") from error
+    Product.cache.delete(str(product_id), STATS_KEY)
+    return product.serialize(), status.HTTP_200_OK, {"ETag": quote_etag(version_etag(product.version))}
+
+
+@route("/products/<int:product_id>", ["DELETE"])
+async def delete_products(request, session, product_id):  # pylint: disable=unused-argument
+    """Deletes a Product"""
+    logger.info("Request to Delete a product with id [%s]", product_id)
+    result = await session.execute(
+        update(Product).where(Product.id == product_id).values(**Product.tombstone_values())
+    )
+    await session.commit()
+    if result.rowcount:
+        Product.cache.delete(str(product_id), STATS_KEY)
+    return None, status.HTTP_204_NO_CONTENT, {}
+
+
+######################################################################
+#  A S G I   A P P L I C A T I O N
+######################################################################
+class Application:
+    """ASGI application that serves the Product handlers
+
+    The engine is created when the server starts, or on the first request
+    if the server does not send lifespan events
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.engine = None
+        self.sessions = None
+
+    def connect(self):
+        """Returns the session factory, creating the engine the first time"""
+        if self.engine is None:
+            uri = self.settings.get("ASYNC_DATABASE_URI") or async_database_uri(
+                self.settings["SQLALCHEMY_DATABASE_URI"]
+            )
+            self.engine = create_async_engine(uri, **async_engine_options(self.settings))
+            self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        return self.sessions
+
+    async def dispose(self):
+        """Closes every pooled connection"""
+        if self.engine is not None:
+            await self.engine.dispose()
+            self.engine = None
+            self.sessions = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http":
+            body = b""
+            more_body = True
+            while more_body:
+                message = await receive()
+                body += message.get("body", b"")
+                more_body = message.get("more_body", False)
+            data, code, headers = await self.dispatch(Request(scope, body))
+            await self.respond(send, data, code, headers)
+
+    async def lifespan(self, receive, send):
+        """Creates the engine on startup and closes it on shutdown"""
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.connect()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def dispatch(self, request):
+        """Runs the handler for a request and turns errors into JSON responses"""
+        try:
+            endpoint, values = request.urls.match(request.path, request.method)
+            handler, database = HANDLERS[endpoint]
+            if not database:
+                return await handler(request, None, **values)
+            async with self.connect()() as session:
+                return await handler(request, session, **values)
+        except DataValidationError as error:
+            return self.error(BadRequest(str(error)))
+        except DataConflictError as error:
+            return self.error(PreconditionFailed(str(error)))
+        except HTTPException as error:
+            return self.error(error)
+
+    @staticmethod
+    def error(error):
+        """Returns the same JSON error body as the Flask error handlers"""
+        message = str(error)
+        logger.warning(message)
+        return {"status": error.code, "error": error.name, "message": message}, error.code, {}
+
+    @staticmethod
+    async def respond(send, data, code, headers):
+        """Sends a JSON response"""
+        body = b"" if code == status.HTTP_204_NO_CONTENT else app.json.dumps_bytes(data)
+        raw_headers = [(b"content-length", str(len(body)).encode("latin-1"))]
+        if body:
+            raw_headers.append((b"content-type", JSON_MIMETYPE.encode("latin-1")))
+        raw_headers.extend((name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers.items())
+        await send({"type": "http.response.start", "status": code, "headers": raw_headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+application = Application(app.config)
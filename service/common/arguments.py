@@ -0,0 +1,116 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Request Arguments
+
+This module contains the functions that parse the query parameters and
+conditional headers of Product requests. The Flask routes and the ASGI
+handlers both use them, so they accept the same requests. A bad value
+raises BadRequest, which both turn into a 400_BAD_REQUEST response.
+"""
+import re
+from decimal import Decimal, InvalidOperation
+from werkzeug.datastructures import ETags
+from werkzeug.exceptions import BadRequest
+from service.common.pagination import decode_cursor
+from service.models import Category
+
+
+def get_category(name: str) -> Category:
+    """Returns the Category enum for a name"""
+    if name.upper() not in Category.__members__:
+        raise BadRequest(f"Invalid category: {name}")
+    return Category[name.upper()]  # create enum from string
+
+
+def get_boolean(args, arg: str):
+    """Returns a true or false query parameter as a bool, if it was given"""
+    value = args.get(arg)
+    if value is None:
+        return None
+    if value.lower() not in ("true", "false"):
+        raise BadRequest(f"Invalid {arg}: {value}, must be true or false")
+    return value.lower() == "true"
+
+
+def get_price(args, arg: str):
+    """Returns a price query parameter as a Decimal, if it was given"""
+    price = args.get(arg)
+    if price is None:
+        return None
+    try:
+        return Decimal(price)
+    except InvalidOperation as error:
+        raise BadRequest(f"Invalid {arg}: {price}") from error
+
+
+def get_page_size(args, settings) -> int:
+    """Returns the requested page size capped at the server maximum
+
+    :param args: the query parameters
+    :param settings: the configuration with PAGE_SIZE_DEFAULT and PAGE_SIZE_MAX
+    """
+    limit = args.get("limit", settings["PAGE_SIZE_DEFAULT"])
+    try:
+        limit = int(limit)
+    except ValueError as error:
+        raise BadRequest(f"Invalid limit: {limit}") from error
+    if limit < 1:
+        raise BadRequest(f"Invalid limit: {limit}")
+    return min(limit, settings["PAGE_SIZE_MAX"])
+
+
+def get_cursor(args, arg: str = "cursor"):
+    """Returns the sort key of the last Product seen from the cursor, if any"""
+    cursor = args.get(arg)
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError as error:
+        raise BadRequest(str(error)) from error
+
+
+def get_filters(args) -> dict:
+    """Returns the filters in the query parameters as arguments of Product.find_by_filters()"""
+    category = args.get("category")
+    available = args.get("available")
+    return {
+        "name": args.get("name") or None,
+        "category": get_category(category) if category else None,
+        "available": available.lower() == "true" if available is not None else None,
+        "min_price": get_price(args, "min_price"),
+        "max_price": get_price(args, "max_price"),
+    }
+
+
+def version_etag(version: int) -> str:
+    """Returns the entity tag of a version of a Product"""
+    return f"v{version}"
+
+
+def if_match_versions(if_match: ETags):
+    """Returns the Product versions allowed by If-Match, or None for any version"""
+    if not if_match or if_match.star_tag:
+        return None
+    versions = []
+    for tag in if_match.as_set():
+        # the client may hold the tag of a compressed representation
+        match = re.fullmatch(r"v(\d+)(-\w+)?", tag)
+        if match:
+            versions.append(int(match.group(1)))
+    return versions
@@ -0,0 +1,161 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Cache Handlers
+
+This module contains the read-through caches used to keep hot, mostly
+static data out of the database. Values must be JSON serializable.
+"""
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger("flask.app")
+
+
+class LRUCache:  # pylint: disable=too-many-instance-attributes
+    """In-process cache that evicts the least recently used entries
+
+    Entries also expire ``ttl`` seconds after they were stored
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str):
+        """Returns the cached value for a key or None if it is not cached"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self._clock():
+                if entry is not None:
+                    del self._entries[key]
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value):
+        """Stores a value, evicting the least recently used entries if full"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys: str):
+        """Removes the entries for the keys"""
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        """Removes every entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Returns the hit, miss and eviction counters"""
+        return {
+            "backend": "memory",
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+        }
+
+
+class SharedCache:
+    """Cache stored in a backend that is shared by every worker
+
+    The client must support the ``get``, ``set(ex=)``, ``delete`` and
+    ``scan_iter`` calls of a Redis client. Eviction is left to the backend.
+    """
+
+    def __init__(self, client, ttl: float = 60, prefix: str = "products:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        """Returns the cached value for a key or None if it is not cached"""
+        payload = self.client.get(self.prefix + key)
+        with self._lock:
+            if payload is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(payload)
+
+    def set(self, key: str, value):
+        """Stores a value that expires after the ttl"""
+        self.client.set(self.prefix + key, json.dumps(value), ex=max(1, int(self.ttl)))
+
+    def delete(self, *keys: str):
+        """Removes the entries for the keys"""
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+    def clear(self):
+        """Removes every entry with this cache's prefix"""
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def stats(self) -> dict:
+        """Returns the hit and miss counters"""
+        return {
+            "backend": "shared",
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": 0,
+        }
+
+
+def init_cache(app):
+    """Creates the cache described by the app configuration
+
+    A SharedCache is used when CACHE_URL points to a Redis server and the
+    redis package is installed, otherwise an in-process LRUCache is used
+    """
+    ttl = app.config.get("CACHE_TTL", 60)
+    url = app.config.get("CACHE_URL")
+    if url:
+        try:
+            import redis  # pylint: disable=import-outside-toplevel
+        except ImportError:
+            logger.warning("CACHE_URL is set but redis is not installed, using an in-process cache")
+        else:
+            logger.info("Using shared cache at %s", url)
+            return SharedCache(redis.Redis.from_url(url), ttl)
+    return LRUCache(app.config.get("CACHE_MAXSIZE", 1024), ttl)
@@ -1,8 +1,24 @@
 """
 Flask CLI Command Extensions
 """
+from datetime import timedelta
+from functools import wraps
+import click
+from sqlalchemy.exc import SQLAlchemyError
 from service import app
-from service.models import db
+from service.common import transfer
+from service.models import db, DataValidationError, Product, set_statement_timeout, utcnow
+
+
+def long_running(command):
+    """Gives a command's SQL statements DB_CLI_STATEMENT_TIMEOUT instead of the request timeout"""
+
+    @wraps(command)
+    def wrapper(*args, **kwargs):
+        set_statement_timeout(app.config["DB_CLI_STATEMENT_TIMEOUT"])
+        return command(*args, **kwargs)
+
+    return wrapper
 
 
 ######################################################################
@@ -10,6 +26,7 @@ from service.models import db
 # Usage: flask db-create
 ######################################################################
 @app.cli.command("db-create")
+@long_running
 def db_create():
     """
     Recreates a local database. You probably should not use this on
@@ -18,3 +35,106 @@ def db_create():
     db.drop_all()
     db.create_all()
     db.session.commit()
+
+
+######################################################################
+# Command to create any missing tables and columns before the service starts
+# Usage: flask db-init
+######################################################################
+@app.cli.command("db-init")
+@long_running
+def db_init():
+    """
+    Creates any missing tables and adds any missing columns to the
+    existing ones without dropping any data. Run this once per deploy when
+    DB_CREATE_ON_STARTUP is false, then db-index for the indexes of the
+    new columns.
+    """
+    Product.create_tables(app.config["DB_CONNECT_RETRIES"], app.config["DB_CONNECT_BACKOFF"])
+    click.echo("Database is ready")
+
+
+######################################################################
+# Command to add missing indexes to an existing database
+# Usage: flask db-index
+######################################################################
+@app.cli.command("db-index")
+@long_running
+def db_index():
+    """
+    Creates any missing indexes without dropping any data. On PostgreSQL
+    the indexes are built concurrently so it is safe to run online.
+    """
+    try:
+        names = Product.create_indexes()
+    except SQLAlchemyError as error:
+        raise click.ClickException(f"Index build failed, run db-index again: {error}") from error
+    for name in names:
+        click.echo(f"Index {name} is in place")
+
+
+######################################################################
+# Command to remove the tombstones of long deleted Products
+# Usage: flask db-purge --days 30
+######################################################################
+@app.cli.command("db-purge")
+@click.option("--days", default=30, show_default=True, help="Keep the tombstones of this many days")
+@long_running
+def db_purge(days):
+    """
+    Removes deleted Products for good once they are older than the given
+    number of days. Clients that last synced from GET /products/changes
+    before then must sync from the start again.
+    """
+    count = Product.purge(utcnow() - timedelta(days=days))
+    click.echo(f"Purged {count} deleted Products")
+
+
+######################################################################
+# Commands to load and dump the catalog as CSV or NDJSON files
+# Usage: flask products-import catalog.csv --checkpoint catalog.ckpt
+#        flask products-export catalog.ndjson
+######################################################################
+@app.cli.command("products-import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(transfer.FORMATS), help="Defaults to the file extension")
+@click.option("--chunk-size", default=5000, show_default=True, help="Products per transaction")
+@click.option("--checkpoint", type=click.Path(dir_okay=False), help="File to save progress to and resume from")
+@click.option("--skip-invalid", is_flag=True, help="Skip invalid records instead of stopping")
+@long_running
+def products_import(path, fmt, chunk_size, checkpoint, skip_invalid):
+    """
+    Creates the Products in a CSV or NDJSON file of any size. Every record
+    is validated like a POST to /products. Rerun with the same checkpoint
+    to resume an interrupted import.
+    """
+    try:
+        count = transfer.import_products(
+            path, transfer.detect_format(path, fmt), chunk_size, checkpoint, skip_invalid,
+            progress=lambda done: click.echo(f"Imported {done} records", err=True),
+        )
+    except DataValidationError as error:
+        raise click.ClickException(str(error)) from error
+    click.echo(f"Imported {count} records from {path}")
+
+
+@app.cli.command("products-export")
+@click.argument("path", type=click.Path(dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(transfer.FORMATS), help="Defaults to the file extension")
+@click.option("--batch-size", default=app.config["STREAM_BATCH_SIZE"], show_default=True, help="Rows per round trip")
+@click.option("--checkpoint", type=click.Path(dir_okay=False), help="File to save progress to and resume from")
+@long_running
+def products_export(path, fmt, batch_size, checkpoint):
+    """
+    Writes every Product to a CSV or NDJSON file in id order, streaming
+    them from the database. Rerun with the same checkpoint to resume an
+    interrupted export.
+    """
+    try:
+        count = transfer.export_products(
+            path, transfer.detect_format(path, fmt), app.json.dumps, batch_size, checkpoint,
+            progress=lambda done: click.echo(f"Exported {done} Products", err=True),
+        )
+    except DataValidationError as error:
+        raise click.ClickException(str(error)) from error
+    click.echo(f"Exported {count} Products to {path}")
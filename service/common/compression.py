@@ -0,0 +1,114 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Response Compression
+
+This module compresses responses with gzip, or brotli when the brotli
+package is installed, based on the Accept-Encoding of the request.
+Streamed responses are compressed chunk by chunk as they are sent.
+"""
+import gzip
+import zlib
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# Content-Encodings in order of preference
+ENCODINGS = ("br", "gzip") if brotli else ("gzip",)
+
+
+def init_compression(app):
+    """Compresses the responses of the app that are worth compressing"""
+    app.config.setdefault("COMPRESS_MIMETYPES", ["application/json", "application/x-ndjson"])
+    app.config.setdefault("COMPRESS_MIN_SIZE", 1024)
+    app.config.setdefault("COMPRESS_LEVEL", 6)
+    app.config.setdefault("COMPRESS_BR_QUALITY", 4)
+    app.after_request(compress_response)
+
+
+def compress_response(response):
+    """Compresses a response with the best encoding the client accepts"""
+    config = current_app.config
+    if (
+        response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or response.mimetype not in config["COMPRESS_MIMETYPES"]
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = request.accept_encodings.best_match(ENCODINGS)
+    if encoding is None:
+        return response
+
+    level = config["COMPRESS_BR_QUALITY"] if encoding == "br" else config["COMPRESS_LEVEL"]
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding, level)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < config["COMPRESS_MIN_SIZE"]:
+            return response
+        response.set_data(compress(data, encoding, level))
+
+    response.headers["Content-Encoding"] = encoding
+    # a compressed body is a different representation so it needs its own tag
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak)
+    return response
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    """Compresses a whole body"""
+    if encoding == "br":
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level)
+
+
+def compress_stream(chunks, encoding: str, level: int):
+    """Compresses a body as it is streamed, flushing after every chunk
+
+    Flushing lets the client decode each chunk as soon as it arrives
+    instead of waiting for the compressor to fill a block
+    """
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=level)
+
+        def process(chunk):
+            return compressor.process(chunk) + compressor.flush()
+
+        finish = compressor.finish
+    else:
+        # wbits of 16 + MAX_WBITS writes a gzip header and trailer
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+        def process(chunk):
+            return compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+        finish = compressor.flush
+
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        data = process(chunk)
+        if data:
+            yield data
+    yield finish()
@@ -0,0 +1,81 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+JSON Provider
+
+This module contains the JSON provider for the Flask app. It encodes with
+orjson when it is installed and falls back to the standard json module.
+Both write Decimals as strings, Enums by name and datetimes in ISO format.
+"""
+import json
+from datetime import date
+from decimal import Decimal
+from enum import Enum
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def default(value):
+    """Encodes the values that the JSON encoders do not know about"""
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider that uses orjson when it is available"""
+
+    use_orjson = orjson is not None
+
+    def dumps(self, obj, **kwargs) -> str:
+        """Serializes an object to a JSON string"""
+        return self.dumps_bytes(obj, **kwargs).decode("utf-8")
+
+    def dumps_bytes(self, obj, **kwargs) -> bytes:
+        """Serializes an object to UTF-8 encoded JSON"""
+        # orjson cannot indent by an arbitrary amount so pretty printing
+        # in debug mode is left to the standard library
+        if self.use_orjson and not kwargs:
+            option = orjson.OPT_SORT_KEYS if self.sort_keys else 0
+            return orjson.dumps(obj, default=default, option=option)
+        kwargs.setdefault("default", default)
+        kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+        kwargs.setdefault("sort_keys", self.sort_keys)
+        return json.dumps(obj, **kwargs).encode("utf-8")
+
+    def loads(self, s, **kwargs):
+        """Deserializes a JSON string or bytes"""
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        """Returns a JSON response with the encoded bytes as the body"""
+        obj = self._prepare_response_obj(args, kwargs)
+        dump_args = {}
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            dump_args.setdefault("indent", 2)
+        body = self.dumps_bytes(obj, **dump_args) + b"\n"
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -18,20 +18,155 @@
 Log Handlers
 
 This module contains utility functions to set up logging
-consistently
+consistently. Requests only put their log records on a queue, and a
+background thread formats and writes them, so a slow log destination
+does not slow down the requests.
 """
+import os
+import copy
+import json
+import queue
+import atexit
+import random
 import logging
+from logging.handlers import QueueHandler, QueueListener
+from flask import g, has_request_context, request
+
+# Attributes that every LogRecord has, anything else was passed in extra
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+# The running listeners, restarted in the child after a fork
+_listeners = []
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each log record as one JSON object per line
+
+    Any ``extra`` fields of the record are added to the object
+    """
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S%z"),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "message": record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in RECORD_ATTRIBUTES and not name.startswith("_"):
+                entry[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RecordQueueHandler(QueueHandler):
+    """Puts records on a queue with their exception kept apart from the message
+
+    QueueHandler folds the traceback into the message, so the formatter
+    at the other end would not know there was one. The traceback is
+    rendered to exc_text here instead, since it cannot outlive the frames.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class RequestFilter(logging.Filter):  # pylint: disable=too-few-public-methods
+    """Adds the request to log records and samples the INFO lines of busy endpoints
+
+    Whether the lines of a request are kept is decided once per request,
+    so a request is either logged completely or not at all. Warnings and
+    errors are always kept.
+    """
+
+    def __init__(self, rates: dict = None):
+        super().__init__()
+        self.rates = rates or {}
+
+    def filter(self, record):
+        if not has_request_context():
+            return True
+        record.method = request.method
+        record.path = request.path
+        record.endpoint = request.endpoint
+        if record.levelno > logging.INFO or request.endpoint not in self.rates:
+            return True
+        if "log_sampled" not in g:
+            g.log_sampled = random.random() < self.rates[request.endpoint]
+        return g.log_sampled
+
+
+def parse_sample_rates(rates: str) -> dict:
+    """Parses sample rates like ``list_products=0.01,get_products=0.1``"""
+    parsed = {}
+    for item in (rates or "").split(","):
+        if not item.strip():
+            continue
+        endpoint, _, rate = item.partition("=")
+        try:
+            parsed[endpoint.strip()] = float(rate)
+        except ValueError as error:
+            raise ValueError(f"Invalid log sample rate: {item}") from error
+    return parsed
+
+
+def start_listener(handlers: list) -> RecordQueueHandler:
+    """Starts a thread that writes queued records to the handlers
+
+    :return: the handler that puts records on the queue
+    """
+    records = queue.SimpleQueue()
+    listener = QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+    return RecordQueueHandler(records)
+
+
+def stop_listeners():
+    """Writes any queued records and stops the listener threads"""
+    while _listeners:
+        _listeners.pop().stop()
+
+
+def _restart_listeners():
+    """Starts new listener threads in a forked child, which has none"""
+    for index, listener in enumerate(_listeners):
+        _listeners[index] = QueueListener(listener.queue, *listener.handlers, respect_handler_level=True)
+        _listeners[index].start()
+
+
+atexit.register(stop_listeners)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_listeners)
 
 
 def init_logging(app, logger_name: str):
     """Set up logging for production"""
     app.logger.propagate = False
     gunicorn_logger = logging.getLogger(logger_name)
-    app.logger.handlers = gunicorn_logger.handlers
+    handlers = list(gunicorn_logger.handlers)
     app.logger.setLevel(gunicorn_logger.level)
     # Make all log formats consistent
-    format_string = "[%(asctime)s] [%(levelname)s] [%(module)s] %(message)s"
-    formatter = logging.Formatter(format_string, "%Y-%m-%d %H:%M:%S %z")
-    for handler in app.logger.handlers:
+    if app.config.get("LOG_FORMAT") == "json":
+        formatter = JsonFormatter()
+    else:
+        format_string = "[%(asctime)s] [%(levelname)s] [%(module)s] %(message)s"
+        formatter = logging.Formatter(format_string, "%Y-%m-%d %H:%M:%S %z")
+    for handler in handlers:
         handler.setFormatter(formatter)
+    if handlers and app.config.get("LOG_QUEUE", True):
+        handlers = [start_listener(handlers)]
+    app.logger.handlers = handlers
+    app.logger.filters = [RequestFilter(parse_sample_rates(app.config.get("LOG_SAMPLE_RATES")))]
     app.logger.info("Logging handler established")
@@ -0,0 +1,117 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Metrics
+
+This module records request, database, pool and cache metrics and serves
+them at /metrics in the Prometheus text format. The SQL statements of each
+request are counted by the profiler module. When gunicorn runs more
+than one worker set PROMETHEUS_MULTIPROC_DIR to an empty directory so the
+metrics of every worker are added together.
+"""
+import os
+import time
+from flask import Response, current_app, g, request
+from prometheus_client import (
+    REGISTRY,
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+REQUEST_COUNT = Counter(
+    "http_requests_total", "Number of HTTP requests handled", ["method", "endpoint", "status"]
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time spent handling HTTP requests", ["method", "endpoint"]
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "Size of HTTP response bodies",
+    ["endpoint"],
+    buckets=(100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000),
+)
+DB_QUERIES = Histogram(
+    "db_queries_per_request",
+    "Number of SQL statements issued per HTTP request",
+    ["endpoint"],
+    buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100, 500),
+)
+DB_TIME = Histogram(
+    "db_time_per_request_seconds", "Time spent in SQL statements per HTTP request", ["endpoint"]
+)
+POOL_CONNECTIONS = Gauge(
+    "db_pool_connections", "Database connections by state", ["state"], multiprocess_mode="livesum"
+)
+CACHE_EVENTS = Gauge(
+    "product_cache_events", "Product cache hits, misses and evictions", ["event"], multiprocess_mode="livesum"
+)
+
+
+def init_metrics(app, pool_stats=None, cache_stats=None):
+    """Records metrics for every request and serves them at /metrics
+
+    :param pool_stats: returns the connection pool counters as a dict
+    :param cache_stats: returns the cache counters as a dict
+    """
+    app.extensions["metrics"] = {"pool_stats": pool_stats, "cache_stats": cache_stats}
+    app.before_request(start_request)
+    app.after_request(record_request)
+    app.add_url_rule("/metrics", "metrics", metrics)
+
+
+def start_request():
+    """Starts the clock for a request"""
+    g.metrics_start = time.perf_counter()
+
+
+def record_request(response):
+    """Records the metrics of a finished request"""
+    if "metrics_start" not in g:
+        return response
+    endpoint = request.endpoint or "none"
+    REQUEST_COUNT.labels(request.method, endpoint, response.status_code).inc()
+    REQUEST_LATENCY.labels(request.method, endpoint).observe(time.perf_counter() - g.metrics_start)
+    if not response.is_streamed:
+        RESPONSE_SIZE.labels(endpoint).observe(response.calculate_content_length() or 0)
+    if "db_queries" in g:
+        DB_QUERIES.labels(endpoint).observe(g.db_queries)
+        DB_TIME.labels(endpoint).observe(g.db_time)
+    sources = current_app.extensions["metrics"]
+    if sources["pool_stats"]:
+        stats = sources["pool_stats"]()
+        for state in ("checkedin", "checkedout", "overflow"):
+            if state in stats:
+                POOL_CONNECTIONS.labels(state).set(stats[state])
+    if sources["cache_stats"]:
+        stats = sources["cache_stats"]()
+        for name in ("hits", "misses", "evictions"):
+            CACHE_EVENTS.labels(name).set(stats[name])
+    return response
+
+
+def metrics():
+    """Returns the metrics in the Prometheus text format"""
+    registry = REGISTRY
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
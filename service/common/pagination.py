@@ -0,0 +1,326 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Pagination Helpers
+
+This module contains utility functions to encode and decode the
+opaque cursors used for keyset pagination, and to page, stream and
+serialize Product queries in the order of their sort keys
+"""
+import json
+import base64
+import logging
+import binascii
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import and_, or_, type_coerce
+from service.models import Category, DataValidationError, Product, db, utcnow
+
+logger = logging.getLogger("flask.app")
+
+# Products are returned in id order unless asked otherwise
+DEFAULT_SORT = [("id", False)]
+
+
+def encode_cursor(keys: list) -> str:
+    """Encodes the sort keys of the last row of a page into an opaque cursor"""
+    payload = json.dumps(keys, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    """Decodes an opaque cursor back into the list of sort keys
+
+    :raises ValueError: if the cursor was not created by encode_cursor()
+    """
+    padding = "=" * (-len(cursor) % 4)
+    try:
+        payload = base64.urlsafe_b64decode(cursor + padding)
+        keys = json.loads(payload)
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as error:
+        raise ValueError(f"Invalid cursor: {cursor}") from error
+    if not isinstance(keys, list) or not keys:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return keys
+
+
+def parse_sort(sort: str = None, search: bool = False) -> list:
+    """Parses a sort specification like ``price,-name`` into sort keys
+
+    The id is always added as the last key so that the order is total,
+    which keyset pagination depends on. Search results can also be
+    sorted by ``rank`` and are sorted by ``-rank`` unless asked otherwise.
+
+    :param sort: comma separated columns, prefixed with - for descending
+    :type sort: str
+
+    :param search: True if the Products are Product.search() results
+    :type search: bool
+
+    :return: a list of (column name, descending) tuples
+    :rtype: list
+
+    """
+    if search and not sort:
+        sort = "-rank"
+    columns = Product.SORT_COLUMNS + ("rank",) if search else Product.SORT_COLUMNS
+    keys = []
+    for field in (sort or "").split(","):
+        field = field.strip()
+        if not field:
+            continue
+        name = field.lstrip("-")
+        if name not in columns:
+            raise DataValidationError(f"Invalid sort field: {name}")
+        keys.append((name, field.startswith("-")))
+    if "id" not in [name for name, _ in keys]:
+        keys.append(("id", False))
+    return keys
+
+
+def sort_key(product, sort: list = None) -> list:
+    """Returns the JSON safe values of the sort keys of a Product or serialized row"""
+    values = []
+    for name, _ in sort or DEFAULT_SORT:
+        value = product[name] if isinstance(product, dict) else getattr(product, name)
+        if isinstance(value, Decimal):
+            value = str(value)
+        elif isinstance(value, Category):
+            value = value.name
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        values.append(value)
+    return values
+
+
+def keyset(query, sort: list = None, after: list = None, rank=None):
+    """Orders a Product query by the sort keys and skips past a cursor
+
+    :param query: the Product query to order
+    :type query: Query
+
+    :param sort: the (column name, descending) keys from parse_sort()
+    :type sort: list
+
+    :param after: the sort_key() of the last Product already seen
+    :type after: list
+
+    :param rank: the Product.search_rank() to sort by rank with
+    :type rank: ColumnElement
+
+    :return: the ordered query
+    :rtype: Query
+
+    """
+    sort = sort or DEFAULT_SORT
+    columns = [(_column(name, rank), descending) for name, descending in sort]
+    if after is not None:
+        values = _parse_sort_key(sort, after)
+        # (a, b) > (x, y) expands to a > x OR (a = x AND b > y)
+        clauses = []
+        for position, (column, descending) in enumerate(columns):
+            equal = [previous == value for (previous, _), value in zip(columns[:position], values)]
+            value = values[position]
+            clauses.append(and_(*equal, column < value if descending else column > value))
+        query = query.filter(or_(*clauses))
+    return query.order_by(*[column.desc() if descending else column for column, descending in columns])
+
+
+def _column(name: str, rank=None):
+    """Returns the column to select or sort by for a field name"""
+    if name == "rank":
+        if rank is None:
+            raise DataValidationError("Only search results can be sorted by rank")
+        return rank
+    return getattr(Product, name)
+
+
+def _parse_sort_key(sort: list, values: list) -> list:
+    """Converts the JSON values of a sort key back into column values"""
+    if len(values) != len(sort):
+        raise DataValidationError("Invalid cursor: does not match the sort order")
+    return [_parse_sort_value(name, value) for (name, _), value in zip(sort, values)]
+
+
+def _parse_sort_value(name: str, value):
+    """Converts the JSON value of one sort key back into its column value"""
+    expected = bool if name == "available" else int if name in ("id", "rank") else str
+    if not isinstance(value, expected) or (expected is int and isinstance(value, bool)):
+        raise DataValidationError(f"Invalid cursor value for {name}: {value}")
+    try:
+        if name == "price":
+            return Decimal(value)
+        if name == "updated_at":
+            return datetime.fromisoformat(value)
+    except (InvalidOperation, ValueError) as error:
+        raise DataValidationError(f"Invalid cursor value for {name}: {value}") from error
+    if name == "category":
+        if value not in Category.__members__:
+            raise DataValidationError(f"Invalid cursor value for category: {value}")
+        return Category[value]
+    return value
+
+
+def paginate(  # pylint: disable=too-many-arguments
+    query, limit: int, after: list = None, sort: list = None, fields: list = None, rank=None
+) -> tuple:
+    """Returns one page of a Product query using keyset pagination
+
+    The page starts right after the ``after`` sort key instead of using
+    OFFSET, so the cost of a page does not grow with how deep the
+    client pages
+
+    :param query: the Product query to page through
+    :type query: Query
+
+    :param limit: the maximum number of Products to return
+    :type limit: int
+
+    :param after: the sort_key() of the last Product of the previous page
+    :type after: list
+
+    :param sort: the (column name, descending) keys from parse_sort()
+    :type sort: list
+
+    :param fields: return serialize_rows() dicts of these fields instead
+    :type fields: list
+
+    :param rank: the Product.search_rank() of search results
+    :type rank: ColumnElement
+
+    :return: the Products on this page and True if there are more pages
+    :rtype: tuple
+
+    """
+    logger.info("Processing page of %s after %s ...", limit, after)
+    page = keyset(query, sort, after, rank).limit(limit + 1)
+    products = page.all() if fields is None else list(serialize_rows(page, fields=fields, rank=rank))
+    return products[:limit], len(products) > limit
+
+
+def stream(  # pylint: disable=too-many-arguments
+    query, after: list = None, sort: list = None, batch_size: int = 1000, fields: list = None, rank=None
+):
+    """Yields the Products of a query without loading them all at once
+
+    The rows are fetched with a server-side cursor ``batch_size`` at a
+    time, so memory use stays flat no matter how large the catalog is
+
+    :param query: the Product query to stream
+    :type query: Query
+
+    :param after: only stream Products after this sort_key()
+    :type after: list
+
+    :param sort: the (column name, descending) keys from parse_sort()
+    :type sort: list
+
+    :param batch_size: the number of rows to fetch per round trip
+    :type batch_size: int
+
+    :param fields: yield serialize_rows() dicts of these fields instead
+    :type fields: list
+
+    :param rank: the Product.search_rank() of search results
+    :type rank: ColumnElement
+
+    """
+    logger.info("Processing stream of Products after %s ...", after)
+    query = keyset(query, sort, after, rank)
+    if fields is not None:
+        yield from serialize_rows(query, batch_size, fields, rank)
+    else:
+        yield from query.yield_per(batch_size)
+
+
+def serialize_rows(query, batch_size: int = None, fields: list = None, rank=None):
+    """Yields the rows of a Product query serialized, without loading Products
+
+    Only the columns are selected and the category is read as the name
+    that is stored, so no ORM object or Category is built for each row.
+    The price and updated_at are left for the JSON provider to encode,
+    which writes them the same way as Product.serialize() does.
+
+    :param query: the Product query to serialize
+    :type query: Query
+
+    :param batch_size: fetch the rows this many at a time if given
+    :type batch_size: int
+
+    :param fields: only select these fields, all of them if not given
+    :type fields: list
+
+    :param rank: the Product.search_rank() to select if the fields include rank
+    :type rank: ColumnElement
+
+    """
+    columns = [
+        type_coerce(Product.category, db.String).label("category") if name == "category" else _column(name, rank)
+        for name in fields or Product.FIELDS
+    ]
+    rows = query.with_entities(*columns)
+    if batch_size:
+        rows = rows.yield_per(batch_size)
+    for row in rows:
+        yield row._asdict()
+
+
+def find_fields(product_id: int, fields: list):
+    """Finds a Product by it's ID and returns only some of its fields
+
+    :param product_id: the id of the Product to find
+    :type product_id: int
+
+    :param fields: the fields to select, from Product.parse_fields()
+    :type fields: list
+
+    :return: the requested fields of the Product, or None if not found
+    :rtype: dict
+
+    """
+    logger.info("Processing lookup of %s for id %s ...", fields, product_id)
+    return next(serialize_rows(Product.query.filter(Product.id == product_id), fields=fields), None)
+
+
+def changes(since: list = None, limit: int = 100, lag: float = 0) -> tuple:
+    """Returns the Products created, updated or deleted after a token
+
+    Changes are read in updated_at and id order, using the index on
+    them, and the sort key of the last one is the token to pass as
+    ``since`` next time. Deleted Products are included as tombstones.
+    Rows updated within the last ``lag`` seconds are held back, so that
+    a transaction that commits late cannot land behind a token that was
+    already handed out.
+
+    :param since: the token of the last change already seen
+    :type since: list
+
+    :param limit: the maximum number of changes to return
+    :type limit: int
+
+    :param lag: only return changes at least this many seconds old
+    :type lag: float
+
+    :return: the changed Products and True if there are more changes
+    :rtype: tuple
+
+    """
+    logger.info("Processing changes since %s ...", since)
+    query = Product.query.execution_options(include_deleted=True).filter(
+        Product.updated_at <= utcnow() - timedelta(seconds=lag)
+    )
+    return paginate(query, limit, since, Product.CHANGES_SORT)
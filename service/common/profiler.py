@@ -0,0 +1,94 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Query Profiler
+
+This module counts the SQL statements of every request and the time spent
+in them. Statements slower than SLOW_QUERY_MS are logged with the values
+of their parameters redacted, requests that issue more than
+QUERY_COUNT_WARN statements are logged as a likely N+1 pattern, and
+SERVER_TIMING adds the totals to a Server-Timing response header.
+"""
+import time
+import logging
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("flask.app")
+
+
+def init_profiler(app):
+    """Profiles the SQL statements of every request"""
+    app.before_request(start_profile)
+    app.after_request(finish_profile)
+    if not event.contains(Engine, "before_cursor_execute", before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+
+
+def start_profile():
+    """Starts counting the statements of a request"""
+    g.profile_start = time.perf_counter()
+    g.db_queries = 0
+    g.db_time = 0.0
+
+
+def finish_profile(response):
+    """Reports the statements of a finished request"""
+    if "profile_start" not in g:
+        return response
+    elapsed = time.perf_counter() - g.profile_start
+    if g.db_queries > current_app.config["QUERY_COUNT_WARN"]:
+        current_app.logger.warning(
+            "%s %s issued %s SQL statements in %.1f ms",
+            request.method, request.path, g.db_queries, g.db_time * 1000,
+        )
+    if current_app.config["SERVER_TIMING"]:
+        response.headers["Server-Timing"] = (
+            f'db;dur={g.db_time * 1000:.1f};desc="{g.db_queries} queries", app;dur={elapsed * 1000:.1f}'
+        )
+    return response
+
+
+def redact(parameters):
+    """Replaces the values of statement parameters with the names of their types"""
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact(value) if isinstance(value, (dict, list, tuple)) else type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Starts timing a SQL statement"""
+    # pylint: disable=unused-argument, too-many-arguments
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Adds a finished SQL statement to the request totals and logs it if it was slow"""
+    # pylint: disable=unused-argument, too-many-arguments
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    if has_request_context() and "db_queries" in g:
+        g.db_queries += 1
+        g.db_time += elapsed
+    if has_app_context() and elapsed * 1000 >= current_app.config["SLOW_QUERY_MS"]:
+        current_app.logger.warning(
+            "Slow SQL statement took %.1f ms: %s parameters=%s",
+            elapsed * 1000, statement, redact(parameters[:1] if executemany else parameters),
+        )
@@ -0,0 +1,180 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Read Replicas
+
+This module sends the SELECT statements of read-only requests to the
+read replicas in DATABASE_REPLICA_URIS, taking turns between them. A
+replica that cannot be reached is ejected for REPLICA_RETRY_SECONDS, and the read that found it down is retried once on
+the next healthy replica or the primary. Everything else, and every request when no replica is healthy, uses the
+primary database.
+
+A request stays on the primary once it writes, and a client that wrote
+gets a cookie that keeps its reads on the primary for
+REPLICA_STICKY_SECONDS, so that it reads its own writes even while the
+replicas lag behind.
+"""
+import time
+import logging
+import threading
+from flask import current_app, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+
+logger = logging.getLogger("flask.app")
+
+# Bind keys of the replica engines in SQLALCHEMY_BINDS
+REPLICA_PREFIX = "replica_"
+
+# Key of the replica engine a session reads from in Session.info
+REPLICA = "replica"
+
+# Cookie that keeps the reads of a client that just wrote on the primary
+STICKY_COOKIE = "read_primary"
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class ReplicaPool:
+    """Takes turns between the healthy replica engines"""
+
+    def __init__(self, engines: list = None, retry_after: float = 30):
+        self.engines = list(engines or [])
+        self.retry_after = retry_after
+        self.ejected = {}
+        self._next = 0
+        self._lock = threading.Lock()
+        for engine in self.engines:
+            event.listen(engine, "handle_error", self.handle_error)
+
+    def choose(self):
+        """Returns the next healthy replica engine, or None if there is none"""
+        with self._lock:
+            now = time.monotonic()
+            for _ in range(len(self.engines)):
+                engine = self.engines[self._next]
+                self._next = (self._next + 1) % len(self.engines)
+                # an ejected replica gets another chance once its time is up
+                if self.ejected.get(engine, 0) <= now:
+                    return engine
+        return None
+
+    def eject(self, engine):
+        """Stops using a replica for retry_after seconds"""
+        logger.warning("Ejecting read replica %s for %s seconds", engine.url, self.retry_after)
+        with self._lock:
+            self.ejected[engine] = time.monotonic() + self.retry_after
+
+    def healthy(self) -> list:
+        """Returns the replica engines that are not ejected"""
+        now = time.monotonic()
+        return [engine for engine in self.engines if self.ejected.get(engine, 0) <= now]
+
+    def handle_error(self, context):
+        """Ejects a replica that cannot be connected to or dropped the connection"""
+        if context.is_disconnect or context.connection is None:
+            self.eject(context.engine)
+
+
+class RoutingSession(Session):
+    """A Session that reads from the replica in its info, if there is one
+
+    Only SELECT statements outside of a flush go to the replica. Anything
+    else moves the session back to the primary for good.
+    """
+
+    def execute(self, statement, *args, **kwargs):  # pylint: disable=arguments-differ
+        """Runs a statement, once more elsewhere if its replica could not be reached"""
+        replica = self.info.get(REPLICA)
+        try:
+            return super().execute(statement, *args, **kwargs)
+        except DBAPIError:
+            pool = current_app.extensions["replicas"]
+            # only retry when the pool ejected the replica for being unreachable
+            if replica is None or self.info.get(REPLICA) is not replica or replica in pool.healthy():
+                raise
+        self.rollback()
+        fallback = pool.choose()
+        if fallback is None:
+            self.info.pop(REPLICA)
+        else:
+            self.info[REPLICA] = fallback
+        logger.warning("Retrying read on %s", fallback.url if fallback else "the primary")
+        return super().execute(statement, *args, **kwargs)
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):  # pylint: disable=arguments-differ
+        replica = self.info.get(REPLICA)
+        if replica is not None and bind is None:
+            if not self._flushing and getattr(clause, "is_select", False):
+                return replica
+            self.info.pop(REPLICA)
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_only(view):
+    """Marks a view whose reads may be served by a replica"""
+    view.read_only = True
+    return view
+
+
+def on_replica(session) -> bool:
+    """Checks if a session is reading from a replica"""
+    return session.info.get(REPLICA) is not None
+
+
+def replica_binds(uris: list) -> dict:
+    """Returns the SQLALCHEMY_BINDS for the replica database URIs"""
+    return {f"{REPLICA_PREFIX}{index}": uri for index, uri in enumerate(uris)}
+
+
+def init_replicas(app, engines: dict, session):
+    """Routes the reads of read-only views to the replica engines
+
+    :param engines: the engines of the Flask-SQLAlchemy binds
+    :param session: the scoped session of the requests
+    """
+    replicas = [engine for key, engine in engines.items() if key and key.startswith(REPLICA_PREFIX)]
+    app.extensions["replicas"] = ReplicaPool(replicas, app.config["REPLICA_RETRY_SECONDS"])
+
+    @app.before_request
+    def use_replica():
+        """Reads from a replica if the view is read-only and the client did not just write"""
+        view = current_app.view_functions.get(request.endpoint)
+        if not getattr(view, "read_only", False) or STICKY_COOKIE in request.cookies:
+            return
+        replica = current_app.extensions["replicas"].choose()
+        if replica is not None:
+            session().info[REPLICA] = replica
+
+    @app.after_request
+    def stick_to_primary(response):
+        """Keeps the reads of a client that wrote on the primary for a while"""
+        if not current_app.extensions["replicas"].engines:
+            return response
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            seconds = current_app.config["REPLICA_STICKY_SECONDS"]
+            response.set_cookie(STICKY_COOKIE, "1", max_age=int(seconds), httponly=True)
+        return response
+
+    @app.teardown_request
+    def release_replica(error):  # pylint: disable=unused-argument
+        """Ends the read transaction on the replica so the next request reads fresh data"""
+        current = session()
+        if on_replica(current):
+            current.info.pop(REPLICA)
+            current.rollback()
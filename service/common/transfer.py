@@ -0,0 +1,205 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Catalog Import and Export
+
+This module streams Products between the database and CSV or NDJSON
+files of any size. Only one chunk of Products is in memory at a time.
+Progress is saved to a checkpoint file after every chunk so that an
+interrupted run picks up where it stopped.
+
+A chunk that was committed just before a crash, but not yet
+checkpointed, is imported again when the run is resumed.
+"""
+import os
+import csv
+import json
+import logging
+from datetime import datetime
+from decimal import Decimal
+from service.common.pagination import DEFAULT_SORT, stream
+from service.models import DataValidationError, Product
+
+logger = logging.getLogger("flask.app")
+
+FORMATS = ("csv", "ndjson")
+
+
+def detect_format(path: str, fmt: str = None) -> str:
+    """Returns the file format given, or the one of the file's extension"""
+    if fmt is None:
+        extension = os.path.splitext(path)[1].lower()
+        fmt = "ndjson" if extension in (".ndjson", ".jsonl") else extension.lstrip(".")
+    if fmt not in FORMATS:
+        raise DataValidationError(f"Unknown file format: {fmt}, use one of {', '.join(FORMATS)}")
+    return fmt
+
+
+def clear_checkpoint(path: str):
+    """Removes the checkpoint of a finished run so the next run starts over"""
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def load_checkpoint(path: str) -> dict:
+    """Returns the progress saved in a checkpoint file, or None if there is none"""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_checkpoint(path: str, progress: dict):
+    """Saves progress to a checkpoint file, replacing it all at once"""
+    if not path:
+        return
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump(progress, file)
+    os.replace(temporary, path)
+
+
+def read_records(file, fmt: str):
+    """Yields the number and data of each record of a file, one at a time"""
+    if fmt == "csv":
+        for number, row in enumerate(csv.DictReader(file), start=1):
+            # CSV has no booleans, so they are written as true and false
+            if isinstance(row.get("available"), str) and row["available"].lower() in ("true", "false"):
+                row["available"] = row["available"].lower() == "true"
+            yield number, row
+        return
+    number = 0
+    for line in file:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            yield number, json.loads(line)
+        except json.JSONDecodeError as error:
+            raise DataValidationError(f"Record {number}: invalid JSON: {error}") from error
+
+
+def import_products(  # pylint: disable=too-many-arguments
+    path: str, fmt: str, chunk_size: int = 500, checkpoint: str = None, skip_invalid: bool = False, progress=None
+) -> int:
+    """Creates the Products in a CSV or NDJSON file, a chunk at a time
+
+    Every record is validated by Product.deserialize() and each chunk is
+    written with Product.create_bulk() in its own transaction
+
+    :param path: the file to read
+    :param fmt: csv or ndjson
+    :param chunk_size: the number of Products per transaction
+    :param checkpoint: the file to save progress to and resume from, removed when done
+    :param skip_invalid: log and skip invalid records instead of stopping
+    :param progress: called with the number of records done after each chunk
+    :return: the number of records done, including those of earlier runs
+    """
+    done = (load_checkpoint(checkpoint) or {}).get("records", 0)
+    if done:
+        logger.info("Resuming import of %s after record %s", path, done)
+    chunk = []
+    number = done
+    with open(path, encoding="utf-8", newline="") as file:
+        for number, data in read_records(file, fmt):
+            if number <= done:
+                continue
+            try:
+                chunk.append(Product().deserialize(data))
+            except DataValidationError as error:
+                if not skip_invalid:
+                    raise DataValidationError(f"Record {number}: {error}") from error
+                logger.warning("Skipping record %s: %s", number, error)
+            if number - done >= chunk_size:
+                done = _import_chunk(chunk, number, checkpoint, progress)
+                chunk = []
+        if number > done:
+            done = _import_chunk(chunk, number, checkpoint, progress)
+    clear_checkpoint(checkpoint)
+    return done
+
+
+def _import_chunk(chunk: list, number: int, checkpoint: str, progress) -> int:
+    """Creates a chunk of Products and saves the progress"""
+    if chunk:
+        Product.create_bulk(chunk)
+    save_checkpoint(checkpoint, {"records": number})
+    if progress:
+        progress(number)
+    return number
+
+
+def export_value(value):
+    """Returns a column value the way it is written to CSV"""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def export_products(  # pylint: disable=too-many-arguments
+    path: str, fmt: str, dumps, batch_size: int = 1000, checkpoint: str = None, progress=None
+) -> int:
+    """Writes every Product to a CSV or NDJSON file in id order
+
+    The Products are read with pagination.stream(), which uses a server-side
+    cursor, and written as they arrive. On resume the file is cut back to
+    where the checkpoint was saved and appended to.
+
+    :param path: the file to write
+    :param fmt: csv or ndjson
+    :param dumps: encodes a row as JSON, like the app's JSON provider
+    :param batch_size: the number of rows per round trip and checkpoint
+    :param checkpoint: the file to save progress to and resume from, removed when done
+    :param progress: called with the number of Products written after each batch
+    :return: the number of Products written, including those of earlier runs
+    """
+    saved = load_checkpoint(checkpoint) or {"after": None, "offset": 0, "records": 0}
+    if saved["offset"]:
+        logger.info("Resuming export to %s after id %s", path, saved["after"])
+        os.truncate(path, saved["offset"])
+    done = saved["records"]
+    last_id = None
+    with open(path, "a" if saved["offset"] else "w", encoding="utf-8", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=Product.FIELDS) if fmt == "csv" else None
+        if writer and not saved["offset"]:
+            writer.writeheader()
+        after = [saved["after"]] if saved["after"] is not None else None
+        for row in stream(Product.query, after, DEFAULT_SORT, batch_size, list(Product.FIELDS)):
+            if writer:
+                writer.writerow({name: export_value(value) for name, value in row.items()})
+            else:
+                file.write(dumps(row) + "\n")
+            done += 1
+            last_id = row["id"]
+            if done % batch_size == 0:
+                _save_export(file, checkpoint, last_id, done, progress)
+        if last_id is not None:
+            _save_export(file, checkpoint, last_id, done, progress)
+    clear_checkpoint(checkpoint)
+    return done
+
+
+def _save_export(file, checkpoint: str, last_id: int, done: int, progress):
+    """Flushes the exported rows and saves the progress"""
+    file.flush()
+    save_checkpoint(checkpoint, {"after": last_id, "offset": file.tell(), "records": done})
+    if progress:
+        progress(done)
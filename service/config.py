@@ -13,8 +13,114 @@ DATABASE_URI = os.getenv(
 # Configure SQLAlchemy
 SQLALCHEMY_DATABASE_URI = DATABASE_URI
 SQLALCHEMY_TRACK_MODIFICATIONS = False
-# SQLALCHEMY_POOL_SIZE = 2
+
+# Comma separated URIs of read replicas of DATABASE_URI. The reads of
+# read-only requests take turns between them. A replica that cannot be
+# reached is skipped for REPLICA_RETRY_SECONDS, and a client that wrote
+# reads from the primary for REPLICA_STICKY_SECONDS.
+DATABASE_REPLICA_URIS = [uri.strip() for uri in os.getenv("DATABASE_REPLICA_URIS", "").split(",") if uri.strip()]
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+
+# Database URI for the asyncio entry point in service.asgi. Defaults to
+# DATABASE_URI with the asyncpg or aiosqlite driver.
+ASYNC_DATABASE_URI = os.getenv("ASYNC_DATABASE_URI")
+
+# Create missing tables when a worker starts. Set this to false and run
+# "flask db-init" once per deploy instead so that workers start without
+# touching the database, which then connects on the first request
+DB_CREATE_ON_STARTUP = os.getenv("DB_CREATE_ON_STARTUP", "true").lower() == "true"
+
+# How often to retry creating the tables while the database is unreachable,
+# doubling the delay in seconds between attempts
+DB_CONNECT_RETRIES = int(os.getenv("DB_CONNECT_RETRIES", "5"))
+DB_CONNECT_BACKOFF = float(os.getenv("DB_CONNECT_BACKOFF", "0.5"))
+
+# Connection pool settings, turned into SQLALCHEMY_ENGINE_OPTIONS by
+# engine_options() when the database is initialized. These are per worker.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+DB_STATEMENT_TIMEOUT = int(os.getenv("DB_STATEMENT_TIMEOUT", "30000"))  # milliseconds
+# The flask CLI commands load, dump and index the whole catalog, so their
+# statements get this timeout instead, 0 for none
+DB_CLI_STATEMENT_TIMEOUT = int(os.getenv("DB_CLI_STATEMENT_TIMEOUT", "0"))  # milliseconds
+
+# Keyset pagination page sizes for listing Products
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "100"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "1000"))
+
+# Number of rows fetched per round trip when streaming Products
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "1000"))
+
+# Number of rows written per INSERT statement when creating Products in bulk
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+
+# Read-through cache of serialized Products. Set CACHE_URL to a Redis
+# server to share the cache between workers
+CACHE_TTL = int(os.getenv("CACHE_TTL", "60"))
+CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", "10000"))
+CACHE_URL = os.getenv("CACHE_URL")
+
+# Compression of JSON responses, with brotli if it is installed
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))
+COMPRESS_BR_QUALITY = int(os.getenv("COMPRESS_BR_QUALITY", "4"))
+
+# GET /products/changes holds back changes younger than this many seconds,
+# so that a slow transaction cannot commit behind a token already handed out
+CHANGES_LAG = float(os.getenv("CHANGES_LAG", "5"))
+
+# Serve GET /products/stats from the cache until a Product is written. Off
+# by default without CACHE_URL, since another worker's writes would not
+# clear the cache of this one
+STATS_CACHED = os.getenv("STATS_CACHED", "true" if CACHE_URL else "false").lower() == "true"
 
 # Secret for session management
 SECRET_KEY = os.getenv("SECRET_KEY", "sup3r-s3cr3t")
 LOGGING_LEVEL = logging.INFO
+
+# Log SQL statements slower than this many milliseconds, and requests that
+# issue more statements than QUERY_COUNT_WARN. SERVER_TIMING adds the
+# statement count and time to a Server-Timing response header.
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+QUERY_COUNT_WARN = int(os.getenv("QUERY_COUNT_WARN", "20"))
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() == "true"
+
+# Logging is written by a background thread. LOG_FORMAT=json writes one
+# JSON object per line. LOG_SAMPLE_RATES keeps only a fraction of the INFO
+# lines of busy endpoints, for example "list_products=0.01,get_products=0.1".
+# LOG_PAYLOADS logs request bodies, which may hold data that should not be
+# in the logs.
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_QUEUE = os.getenv("LOG_QUEUE", "true").lower() == "true"
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+LOG_PAYLOADS = os.getenv("LOG_PAYLOADS", "false").lower() == "true"
+
+
+def engine_options(settings) -> dict:
+    """Returns the SQLAlchemy engine options for the configured database
+
+    Pool sizing and timeouts only apply to server databases, SQLite keeps
+    the pool that SQLAlchemy picks for it
+    """
+    options = {
+        "pool_pre_ping": settings["DB_POOL_PRE_PING"],
+        "pool_recycle": settings["DB_POOL_RECYCLE"],
+    }
+    if settings["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+        return options
+    options.update(
+        pool_size=settings["DB_POOL_SIZE"],
+        max_overflow=settings["DB_MAX_OVERFLOW"],
+        pool_timeout=settings["DB_POOL_TIMEOUT"],
+    )
+    if settings["SQLALCHEMY_DATABASE_URI"].startswith("postgresql"):
+        options["connect_args"] = {
+            "connect_timeout": settings["DB_CONNECT_TIMEOUT"],
+            "options": f"-c statement_timeout={settings['DB_STATEMENT_TIMEOUT']}",
+        }
+    return options
@@ -29,15 +29,28 @@ available (boolean) - True for products that are available for adoption
 
 """
 import logging
+import re
+import time
 from enum import Enum
-from decimal import Decimal
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, or_, case, event, func, inspect, insert, literal_column, select, type_coerce, update
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+from sqlalchemy.orm import Session, with_loader_criteria
+from sqlalchemy.orm.exc import StaleDataError
+# importing the dialect registers to_tsvector() and to_tsquery()
+from sqlalchemy.dialects import postgresql  # noqa: F401 pylint: disable=unused-import
+from sqlalchemy.schema import CreateIndex
+from service.common.cache import LRUCache, init_cache
+from service.common.replicas import RoutingSession, init_replicas, on_replica, replica_binds
+from service.config import engine_options
 
 logger = logging.getLogger("flask.app")
 
 # Create the SQLAlchemy object to be initialized later in init_db()
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 
 def init_db(app):
@@ -45,22 +58,112 @@ def init_db(app):
     Product.init_db(app)
 
 
+def set_statement_timeout(milliseconds: int, engine=None):
+    """Changes the statement timeout of new PostgreSQL connections
+
+    The open connections are dropped so that every statement from now on
+    gets the new timeout. Other databases have no statement timeout.
+
+    :param milliseconds: the new timeout, 0 for none
+    :param engine: the engine to change, db.engine if not given
+    """
+    engine = engine or db.engine
+    if engine.dialect.name != "postgresql":
+        return
+
+    def connect(dialect, connection_record, cargs, cparams):  # pylint: disable=unused-argument
+        option = f"-c statement_timeout={int(milliseconds)}"
+        options = cparams.get("options", "")
+        if re.search(r"-c statement_timeout=\d+", options):
+            cparams["options"] = re.sub(r"-c statement_timeout=\d+", option, options)
+        else:
+            cparams["options"] = f"{options} {option}".strip()
+
+    event.listen(engine, "do_connect", connect)
+    engine.dispose()
+
+
+def database_ready() -> bool:
+    """Returns True if the database can be reached and has the Product table"""
+    try:
+        return inspect(db.engine).has_table(Product.__tablename__)
+    except SQLAlchemyError as error:
+        logger.warning("Database is not ready: %s", error)
+        return False
+
+
+def cache_stats() -> dict:
+    """Returns the hit, miss and eviction counters of the Product cache"""
+    return Product.cache.stats()
+
+
+def pool_stats() -> dict:
+    """Returns how much of the database connection pool is in use"""
+    pool = db.engine.pool
+    stats = {"pool": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        counter = getattr(pool, name, None)
+        if callable(counter):
+            stats[name] = counter()
+    return stats
+
+
+def utcnow() -> datetime:
+    """Returns the current UTC time without a timezone, as it is stored"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def search_document(name, description):
+    """Returns the full text search vector of a Product's name and description
+
+    The same expression is indexed, so that PostgreSQL uses the index
+    """
+    return func.to_tsvector(literal_column("'simple'"), name + literal_column("' '", db.String) + description)
+
+
+def like_pattern(text: str) -> str:
+    """Returns a LIKE pattern that matches the text anywhere, escaping wildcards"""
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
 class DataValidationError(Exception):
     """Used for an data validation errors when deserializing"""
 
 
+class DataConflictError(Exception):
+    """Used when a Product was changed by someone else since it was read"""
+
+
 class Category(Enum):
-    """Enumeration of valid Product Categories"""
+    """Enumeration of valid Product Categories
+
+    The values are the names so that every JSON encoder, including the
+    ones that write Enums by value, writes the same string as serialize()
+    """
+
+    UNKNOWN = "UNKNOWN"
+    CLOTHS = "CLOTHS"
+    FOOD = "FOOD"
+    HOUSEWARES = "HOUSEWARES"
+    AUTOMOTIVE = "AUTOMOTIVE"
+    TOOLS = "TOOLS"
+
 
-    UNKNOWN = 0
-    CLOTHS = 1
-    FOOD = 2
-    HOUSEWARES = 3
-    AUTOMOTIVE = 4
-    TOOLS = 5
+# Cache key of the Category statistics, dropped on every write
+STATS_KEY = "stats"
 
+# The trigram index used by search() needs this PostgreSQL extension
+TRIGRAM_EXTENSION = DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm")
 
-class Product(db.Model):
+# True if a PostgreSQL index was left invalid by a failed or cancelled
+# CREATE INDEX CONCURRENTLY, None if there is no such index
+INDEX_INVALID = db.text(
+    "SELECT NOT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+)
+
+
+class Product(db.Model):  # pylint: disable=too-many-public-methods
     """
     Class that represents a Product
 
@@ -79,6 +182,47 @@ class Product(db.Model):
     category = db.Column(
         db.Enum(Category), nullable=False, server_default=(Category.UNKNOWN.name)
     )
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow, onupdate=utcnow)
+    # Deleted Products are kept as tombstones so that changes() can report
+    # them, and are hidden from every other query
+    deleted_at = db.Column(db.DateTime, nullable=True)
+    # Incremented on every update so that concurrent writers cannot
+    # silently overwrite each other
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
+
+    # Indexes for the columns that the find_by_* queries filter on
+    __table_args__ = (
+        db.Index("ix_product_name", "name"),
+        db.Index("ix_product_category_available", "category", "available"),
+        db.Index("ix_product_available", "available"),
+        db.Index("ix_product_price", "price"),
+        # the order that changes() reads the feed in
+        db.Index("ix_product_updated_at", "updated_at", "id"),
+        # full text and trigram indexes for search(), only on PostgreSQL
+        db.Index(
+            "ix_product_search", search_document(name, description), postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+        db.Index(
+            "ix_product_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}
+        ).ddl_if(dialect="postgresql"),
+    )
+
+    # Fields that a partial update can change
+    EDITABLE_FIELDS = ("name", "description", "price", "available", "category")
+
+    # Columns that Products can be sorted by
+    SORT_COLUMNS = ("id", "name", "price", "category", "available", "updated_at")
+
+    # Fields of a serialized Product, in order
+    FIELDS = ("id", "name", "description", "price", "available", "category", "created_at", "updated_at", "version")
+
+    # The order of the change feed, which is also its token
+    CHANGES_SORT = [("updated_at", False), ("id", False)]
+
+    # Read-through cache of serialized Products, replaced in init_db()
+    cache = LRUCache()
 
     ##################################################
     # INSTANCE METHODS
@@ -96,22 +240,33 @@ class Product(db.Model):
         self.id = None  # pylint: disable=invalid-name
         db.session.add(self)
         db.session.commit()
+        self.cache.delete(STATS_KEY)
 
     def update(self):
         """
         Updates a Product to the database
+
+        The UPDATE only matches the version that was read, so it raises
+        DataConflictError if someone else changed the Product since then
         """
         logger.info("Saving %s", self.name)
         if not self.id:
             raise DataValidationError("Update called with empty ID field")
         db.session.add(self)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except StaleDataError as error:
+            db.session.rollback()
+            self.cache.delete(str(self.id))
+            raise DataConflictError(f"Product with id '{self.id}' was changed by someone else") from error
+        self.cache.delete(str(self.id), STATS_KEY)
 
     def delete(self):
-        """Removes a Product from the data store"""
+        """Removes a Product from the data store, leaving a tombstone"""
         logger.info("Deleting %s", self.name)
-        db.session.delete(self)
+        db.session.execute(update(Product).where(Product.id == self.id).values(**self.tombstone_values()))
         db.session.commit()
+        self.cache.delete(str(self.id), STATS_KEY)
 
     def serialize(self) -> dict:
         """Serializes a Product into a dictionary"""
@@ -121,7 +276,10 @@ class Product(db.Model):
             "description": self.description,
             "price": str(self.price),
             "available": self.available,
-            "category": self.category.name  # convert enum to string
+            "category": self.category.name,  # convert enum to string
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+            "version": self.version,
         }
 
     def deserialize(self, data: dict):
@@ -131,9 +289,9 @@ class Product(db.Model):
             data (dict): A dictionary containing the Product data
         """
         try:
-            self.name = data["name"]
-            self.description = data["description"]
-            self.price = Decimal(data["price"])
+            self.name = self._check_string("name", data["name"])
+            self.description = self._check_string("description", data["description"])
+            self.price = self._check_price(Decimal(data["price"]))
             if isinstance(data["available"], bool):
                 self.available = data["available"]
             else:
@@ -150,25 +308,375 @@ class Product(db.Model):
             raise DataValidationError(
                 "Invalid product: body of request contained bad or no data " + str(error)
             ) from error
+        except InvalidOperation as error:
+            raise DataValidationError("Invalid price: " + str(data["price"])) from error
         return self
 
     ##################################################
     # CLASS METHODS
     ##################################################
 
+    @classmethod
+    def tombstone_values(cls) -> dict:
+        """Returns the column values that turn Products into tombstones
+
+        The update time and version move on, so that the deletion shows up
+        in changes() and concurrent writers get a conflict
+        """
+        now = utcnow()
+        return {"deleted_at": now, "updated_at": now, "version": cls.version + 1}
+
+    @classmethod
+    def parse_changes(cls, data: dict) -> dict:
+        """Validates the fields of a partial update
+
+        :param data: some of the fields of a serialized Product
+        :type data: dict
+
+        :return: the new values of the columns to change
+        :rtype: dict
+
+        """
+        if not isinstance(data, dict) or not data:
+            raise DataValidationError("Invalid update: body of request contained bad or no data")
+        return {name: cls._parse_change(name, value) for name, value in data.items()}
+
+    @classmethod
+    def _parse_change(cls, name: str, value):
+        """Converts the JSON value of an editable field into its column value"""
+        if name not in cls.EDITABLE_FIELDS:
+            raise DataValidationError(f"Invalid field: {name}")
+        if name in ("name", "description"):
+            return cls._check_string(name, value)
+        if name == "available" and not isinstance(value, bool):
+            raise DataValidationError(f"Invalid type for boolean [available]: {type(value)}")
+        if name == "price":
+            try:
+                return cls._check_price(Decimal(value))
+            except (InvalidOperation, TypeError, ValueError) as error:
+                raise DataValidationError(f"Invalid price: {value}") from error
+        if name == "category":
+            if not isinstance(value, str) or value not in Category.__members__:
+                raise DataValidationError(f"Invalid attribute: {value}")
+            return Category[value]
+        return value
+
+    @classmethod
+    def _check_string(cls, name: str, value) -> str:
+        """Checks that the value of a string field fits in its column"""
+        if not isinstance(value, str):
+            raise DataValidationError(f"Invalid type for string [{name}]: {type(value)}")
+        length = cls.__table__.c[name].type.length
+        if len(value) > length:
+            raise DataValidationError(f"Invalid {name}: longer than {length} characters")
+        return value
+
+    @staticmethod
+    def _check_price(price: Decimal) -> Decimal:
+        """Checks that a price is a number the database can store"""
+        if not price.is_finite():
+            raise DataValidationError(f"Invalid price: {price}")
+        return price
+
+    @classmethod
+    def patch(cls, product_id: int, changes: dict, versions: list = None):
+        """Changes some fields of a Product with a single UPDATE statement
+
+        :param product_id: the id of the Product to change
+        :type product_id: int
+
+        :param changes: the new column values from parse_changes()
+        :type changes: dict
+
+        :param versions: only change the Product if it is one of these versions
+        :type versions: list
+
+        :return: the updated Product or None if it does not exist
+        :rtype: Product
+
+        """
+        logger.info("Patching %s with %s", product_id, list(changes))
+        statement = update(cls).where(cls.id == product_id)
+        if versions is not None:
+            statement = statement.where(cls.version.in_(versions))
+        statement = statement.values(**changes, version=cls.version + 1).returning(cls)
+        product = db.session.scalars(statement).one_or_none()
+        db.session.commit()
+        cls.cache.delete(str(product_id), STATS_KEY)
+        if product is None and versions is not None and cls.find(product_id) is not None:
+            raise DataConflictError(f"Product with id '{product_id}' was changed by someone else")
+        return product
+
+    @classmethod
+    def update_all(
+        cls, changes: dict, ids: list = None, category: Category = None, available: bool = None
+    ) -> int:
+        """Changes some fields of every Product that matches the filters at once
+
+        The rows are changed with a single set-based UPDATE statement
+        instead of loading and updating each Product
+
+        :param changes: the new column values from parse_changes()
+        :type changes: dict
+
+        :param ids: only change the Products with these ids
+        :type ids: list
+
+        :param category: only change Products in this Category
+        :type category: Category
+
+        :param available: only change Products with this availability
+        :type available: bool
+
+        :return: the number of Products changed
+        :rtype: int
+
+        """
+        logger.info("Updating Products ids=%s category=%s available=%s", ids is not None, category, available)
+        query = cls.query
+        if ids is not None:
+            query = query.filter(cls.id.in_(ids))
+        if category is not None:
+            query = query.filter(cls.category == category)
+        if available is not None:
+            query = query.filter(cls.available == available)
+        count = query.update(dict(changes, version=cls.version + 1), synchronize_session=False)
+        db.session.commit()
+        if ids is not None:
+            cls.cache.delete(*[str(product_id) for product_id in ids], STATS_KEY)
+        else:
+            cls.cache.clear()
+        return count
+
     @classmethod
     def init_db(cls, app: Flask):
         """Initializes the database session
 
+        No connection is made unless DB_CREATE_ON_STARTUP is set, in which
+        case any missing tables are created. The tables of the read
+        replicas are left to the database's replication.
+
         :param app: the Flask app
         :type data: Flask
 
         """
         logger.info("Initializing database")
-        # This is where we initialize SQLAlchemy from the Flask app
-        db.init_app(app)
-        app.app_context().push()
-        db.create_all()  # make our sqlalchemy tables
+        # An app that has already handled requests cannot be set up again
+        if "sqlalchemy" not in app.extensions:
+            # This is where we initialize SQLAlchemy from the Flask app
+            app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config))
+            app.config.setdefault("SQLALCHEMY_BINDS", replica_binds(app.config.get("DATABASE_REPLICA_URIS", [])))
+            db.init_app(app)
+            app.app_context().push()
+            init_replicas(app, db.engines, db.session)
+        if app.config.get("DB_CREATE_ON_STARTUP", True):
+            cls.create_tables(app.config.get("DB_CONNECT_RETRIES", 0), app.config.get("DB_CONNECT_BACKOFF", 0.5))
+        cls.cache = init_cache(app)
+
+    @classmethod
+    def create_tables(cls, retries: int = 0, backoff: float = 0.5):
+        """Creates any missing tables and columns, waiting for the database to come up
+
+        :param retries: how many more times to try while the database is unreachable
+        :type retries: int
+
+        :param backoff: the seconds to wait before the first retry, doubled after each one
+        :type backoff: float
+
+        """
+        for attempt in range(retries + 1):
+            try:
+                db.create_all()  # make our sqlalchemy tables
+                cls.add_missing_columns()
+                return
+            except OperationalError as error:
+                if attempt == retries:
+                    raise
+                delay = backoff * 2**attempt
+                logger.warning("Database is unreachable, retrying in %.1f seconds: %s", delay, error)
+                time.sleep(delay)
+
+    @classmethod
+    def add_missing_columns(cls, batch_size: int = 5000) -> list:
+        """Adds the columns of the Product model that an existing table lacks
+
+        create_all() only creates missing tables, so a database created by
+        an older version is upgraded in place without dropping any data. A
+        NOT NULL column without a server default is added as nullable and
+        filled in batches of ``batch_size`` rows, each in its own
+        transaction so no lock is held for long. PostgreSQL then marks it
+        NOT NULL, which SQLite cannot do after the fact.
+
+        :param batch_size: the number of rows to fill in per UPDATE
+        :type batch_size: int
+
+        :return: the names of the columns that were added
+        :rtype: list
+
+        """
+        engine = db.engine
+        table = cls.__table__
+        existing = {column["name"] for column in inspect(engine).get_columns(table.name)}
+        missing = [column for column in table.columns if column.name not in existing]
+        preparer = engine.dialect.identifier_preparer
+        ddl = engine.dialect.ddl_compiler(engine.dialect, None)
+        alter = f"ALTER TABLE {preparer.format_table(table)}"
+        # another worker may be adding the same columns at the same time
+        add = "ADD COLUMN IF NOT EXISTS" if engine.dialect.name == "postgresql" else "ADD COLUMN"
+        for column in missing:
+            logger.info("Adding column %s to %s", column.name, table.name)
+            spec = f"{preparer.quote(column.name)} {column.type.compile(dialect=engine.dialect)}"
+            default = ddl.get_column_default_string(column)
+            if default is not None:
+                spec += f" DEFAULT {default}" + ("" if column.nullable else " NOT NULL")
+            with engine.begin() as connection:
+                connection.exec_driver_sql(f"{alter} {add} {spec}")
+        # the UPDATEs also set the onupdate columns, so they must all exist first
+        for column in missing:
+            if column.nullable or column.server_default is not None:
+                continue
+            batch = select(table.c.id).where(column.is_(None)).limit(batch_size)
+            fill = update(table).where(table.c.id.in_(batch)).values({column.name: utcnow()})
+            while True:
+                with engine.begin() as connection:
+                    if connection.execute(fill).rowcount == 0:
+                        break
+            if engine.dialect.name == "postgresql":
+                with engine.begin() as connection:
+                    connection.exec_driver_sql(f"{alter} ALTER COLUMN {preparer.quote(column.name)} SET NOT NULL")
+        return [column.name for column in missing]
+
+    @classmethod
+    def create_bulk(cls, products: list, chunk_size: int = 500) -> list:
+        """Creates many Products in a single transaction
+
+        The Products are written with batched ``INSERT ... RETURNING``
+        statements of ``chunk_size`` rows and committed once at the end
+
+        :param products: the deserialized Products to create
+        :type products: list
+
+        :param chunk_size: the number of rows per INSERT statement
+        :type chunk_size: int
+
+        :return: the newly created Products
+        :rtype: list
+
+        """
+        logger.info("Creating %s Products in bulk", len(products))
+        created = []
+        statement = insert(cls).returning(cls)
+        for start in range(0, len(products), chunk_size):
+            rows = [
+                {
+                    "name": product.name,
+                    "description": product.description,
+                    "price": product.price,
+                    "available": product.available,
+                    "category": product.category,
+                }
+                for product in products[start:start + chunk_size]
+            ]
+            created.extend(db.session.scalars(statement, rows).all())
+        db.session.commit()
+        cls.cache.delete(STATS_KEY)
+        return created
+
+    @classmethod
+    def delete_all(cls, category: Category = None, available: bool = None) -> int:
+        """Removes all Products, or only those matching the filters, at once
+
+        The rows are turned into tombstones with a single set-based UPDATE
+        statement instead of loading and deleting each Product
+
+        :param category: only remove Products in this Category
+        :type category: Category
+
+        :param available: only remove Products with this availability
+        :type available: bool
+
+        :return: the number of Products removed
+        :rtype: int
+
+        """
+        logger.info("Deleting Products category=%s available=%s", category, available)
+        query = cls.query
+        if category is not None:
+            query = query.filter(cls.category == category)
+        if available is not None:
+            query = query.filter(cls.available == available)
+        count = query.update(cls.tombstone_values(), synchronize_session=False)
+        db.session.commit()
+        cls.cache.clear()
+        return count
+
+    @classmethod
+    def purge(cls, before: datetime) -> int:
+        """Removes the tombstones of Products deleted before a time
+
+        Clients that last synced before then can no longer learn about
+        those deletions from changes() and must sync from the start
+
+        :param before: remove the Products deleted before this UTC time
+        :type before: datetime
+
+        :return: the number of tombstones removed
+        :rtype: int
+
+        """
+        logger.info("Purging Products deleted before %s", before)
+        count = (
+            cls.query.execution_options(include_deleted=True)
+            .filter(cls.deleted_at.is_not(None), cls.deleted_at < before)
+            .delete(synchronize_session=False)
+        )
+        db.session.commit()
+        return count
+
+    @classmethod
+    def create_indexes(cls) -> list:
+        """Creates any missing Product indexes on an existing database
+
+        On PostgreSQL the indexes are built with CREATE INDEX CONCURRENTLY
+        so that reads and writes are not blocked while they are built. An
+        index that an earlier build left invalid is dropped and rebuilt.
+
+        :return: the names of the indexes that were checked
+        :rtype: list
+
+        :raises SQLAlchemyError: if an index could not be built
+
+        """
+        engine = db.engine
+        names = []
+        with engine.connect() as connection:
+            if engine.dialect.name == "postgresql":
+                # CONCURRENTLY cannot run inside a transaction block
+                connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+                # an index build on a large table runs past the request timeout
+                connection.exec_driver_sql("SET statement_timeout = 0")
+                connection.execute(TRIGRAM_EXTENSION)
+            for index in cls.__table__.indexes:
+                logger.info("Creating index %s", index.name)
+                if engine.dialect.name == "postgresql":
+                    cls._create_index_concurrently(connection, index)
+                else:
+                    index.create(connection, checkfirst=True)
+                names.append(index.name)
+            connection.commit()
+        return names
+
+    @staticmethod
+    def _create_index_concurrently(connection, index):
+        """Builds a PostgreSQL index without locking out writes, replacing it if it is invalid"""
+        name = connection.dialect.identifier_preparer.quote(index.name)
+        if connection.execute(INDEX_INVALID, {"name": index.name}).scalar():
+            logger.warning("Rebuilding invalid index %s", index.name)
+            connection.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=connection.dialect))
+        connection.exec_driver_sql(ddl.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1))
+        if connection.execute(INDEX_INVALID, {"name": index.name}).scalar() is not False:
+            raise SQLAlchemyError(f"Index {index.name} could not be built")
 
     @classmethod
     def all(cls) -> list:
@@ -188,7 +696,120 @@ class Product(db.Model):
 
         """
         logger.info("Processing lookup for id %s ...", product_id)
-        return cls.query.get(product_id)
+        # a query rather than get(), which would return a deleted Product
+        # that is still in the session
+        return cls.query.filter(cls.id == product_id).one_or_none()
+
+    @classmethod
+    def find_cached(cls, product_id: int):
+        """Finds a Product by it's ID and returns it serialized
+
+        The serialized Product is read through the cache so repeated reads
+        do not go to the database until it is updated, deleted or expires.
+        The writes of other workers do not clear an in-process cache, so
+        its copy can be up to CACHE_TTL seconds stale. An update based on
+        a stale copy fails with DataConflictError and drops the copy.
+
+        :param product_id: the id of the Product to find
+        :type product_id: int
+
+        :return: the serialized Product, or None if not found
+        :rtype: dict
+
+        """
+        key = str(product_id)
+        data = cls.cache.get(key)
+        if data is None:
+            product = cls.find(product_id)
+            if product is None:
+                return None
+            data = product.serialize()
+            # a lagging replica could put back what a write just invalidated
+            if not on_replica(db.session):
+                cls.cache.set(key, data)
+        return data
+
+    @classmethod
+    def fingerprint(cls, query) -> tuple:
+        """Summarizes the rows of a query without loading them
+
+        Any insert, update or delete of a selected row changes the summary,
+        so it can be used to validate a cached copy of a listing
+
+        :param query: the Product query to summarize
+        :type query: Query
+
+        :return: the count, last update time and sum of ids of the rows
+        :rtype: tuple
+
+        """
+        # pylint: disable=not-callable
+        rows = query.with_entities(cls.id, cls.updated_at).subquery()
+        return tuple(
+            db.session.query(func.count(rows.c.id), func.max(rows.c.updated_at), func.sum(rows.c.id)).one()
+        )
+
+    @classmethod
+    def parse_fields(cls, fields: str = None) -> list:
+        """Parses a comma separated list of fields like ``id,name,price``
+
+        :param fields: the fields to return, or None for all of them
+        :type fields: str
+
+        :return: the field names, or None for all of them
+        :rtype: list
+
+        """
+        names = [name.strip() for name in (fields or "").split(",") if name.strip()]
+        for name in names:
+            if name not in cls.FIELDS:
+                raise DataValidationError(f"Invalid field: {name}")
+        return list(dict.fromkeys(names)) or None
+
+    @classmethod
+    def stats(cls, cached: bool = False) -> list:
+        """Returns the number of Products and their prices per Category
+
+        Everything is computed by the database in a single GROUP BY query.
+        The cached result is dropped whenever a Product is written.
+
+        :param cached: reuse the last result if nothing was written since
+        :type cached: bool
+
+        :return: one dict per Category that has Products
+        :rtype: list
+
+        """
+        if cached:
+            stats = cls.cache.get(STATS_KEY)
+            if stats is not None:
+                return stats
+        logger.info("Processing Category statistics ...")
+        # pylint: disable=not-callable
+        rows = db.session.query(
+            type_coerce(cls.category, db.String).label("category"),
+            func.count(cls.id).label("count"),
+            func.sum(case((cls.available.is_(True), 1), else_=0)).label("available"),
+            func.min(cls.price).label("min_price"),
+            func.avg(cls.price).label("avg_price"),
+            func.max(cls.price).label("max_price"),
+        ).group_by(cls.category).order_by(cls.category)
+        # prices are strings like in serialize() so the result can be cached
+        cent = Decimal("0.01")
+        stats = [
+            {
+                "category": row.category,
+                "count": row.count,
+                "available": int(row.available),
+                "min_price": str(row.min_price),
+                "avg_price": str(Decimal(str(row.avg_price)).quantize(cent)),
+                "max_price": str(row.max_price),
+            }
+            for row in rows
+        ]
+        if not on_replica(db.session):
+            cls.cache.set(STATS_KEY, stats)
+        return stats
 
     @classmethod
     def find_by_name(cls, name: str) -> list:
@@ -249,3 +870,130 @@ class Product(db.Model):
         """
         logger.info("Processing category query for %s ...", category.name)
         return cls.query.filter(cls.category == category)
+
+    @classmethod
+    def find_by_filters(  # pylint: disable=too-many-arguments
+        cls,
+        name: str = None,
+        category: Category = None,
+        available: bool = None,
+        min_price: Decimal = None,
+        max_price: Decimal = None,
+        query=None,
+    ):
+        """Returns all Products that match every filter that is given
+
+        All of the filters are combined into a single WHERE clause so the
+        database does the narrowing. Filters left as None are ignored.
+
+        :param name: the name of the Products you want to match
+        :type name: str
+
+        :param category: the Category of the Products you want to match
+        :type category: Category
+
+        :param available: True for products that are available
+        :type available: bool
+
+        :param min_price: the lowest price to include
+        :type min_price: Decimal
+
+        :param max_price: the highest price to include
+        :type max_price: Decimal
+
+        :param query: narrow this query or select() instead of all Products
+        :type query: Query
+
+        :return: a query for the matching Products
+        :rtype: Query
+
+        """
+        logger.info(
+            "Processing filter query name=%s category=%s available=%s price=[%s, %s] ...",
+            name, category, available, min_price, max_price
+        )
+        query = cls.query if query is None else query
+        if name is not None:
+            query = query.filter(cls.name == name)
+        if category is not None:
+            query = query.filter(cls.category == category)
+        if available is not None:
+            query = query.filter(cls.available == available)
+        if min_price is not None:
+            query = query.filter(cls.price >= min_price)
+        if max_price is not None:
+            query = query.filter(cls.price <= max_price)
+        return query
+
+    @classmethod
+    def search(cls, query, text: str):
+        """Narrows a Product query to the Products that match a search text
+
+        On PostgreSQL every word of the text is matched as a prefix of a
+        word in the name or description using the full text index, and the
+        name is also matched anywhere using the trigram index. Elsewhere the
+        text is matched anywhere in the name or description.
+
+        :param query: the Product query to narrow
+        :type query: Query
+
+        :param text: the text to search for
+        :type text: str
+
+        :return: the narrowed query
+        :rtype: Query
+
+        """
+        logger.info("Processing search query for %s ...", text)
+        pattern = like_pattern(text)
+        name_matches = cls.name.ilike(pattern, escape="\\")
+        if db.engine.dialect.name != "postgresql":
+            return query.filter(or_(name_matches, cls.description.ilike(pattern, escape="\\")))
+        words = re.findall(r"\w+", text)
+        if not words:
+            return query.filter(name_matches)
+        prefixes = func.to_tsquery(literal_column("'simple'"), " & ".join(f"{word}:*" for word in words))
+        return query.filter(or_(search_document(cls.name, cls.description).op("@@")(prefixes), name_matches))
+
+    @classmethod
+    def search_rank(cls, text: str):
+        """Returns how well a Product's name matches a search text
+
+        The rank is 4 for the same name, 3 if the name starts with the
+        text, 2 if the name contains it and 1 for any other match. It is an
+        integer so that it can be part of a pagination cursor.
+
+        :param text: the text that was searched for
+        :type text: str
+
+        :return: the rank as a SQL expression labeled rank
+        :rtype: ColumnElement
+
+        """
+        pattern = like_pattern(text)
+        name = func.lower(cls.name)
+        return case(
+            (name == text.lower(), 4),
+            (name.like(pattern[1:].lower(), escape="\\"), 3),
+            (name.like(pattern.lower(), escape="\\"), 2),
+            else_=1,
+        ).label("rank")
+
+
+event.listen(Product.__table__, "before_create", TRIGRAM_EXTENSION.execute_if(dialect="postgresql"))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def hide_deleted(orm_execute_state):
+    """Leaves the tombstones of deleted Products out of every ORM statement
+
+    Pass the ``include_deleted=True`` execution option to see them
+    """
+    if not (orm_execute_state.is_select or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    if orm_execute_state.is_column_load or orm_execute_state.is_relationship_load:
+        return
+    if not orm_execute_state.execution_options.get("include_deleted", False):
+        orm_execute_state.statement = orm_execute_state.statement.options(
+            with_loader_criteria(Product, Product.deleted_at.is_(None), include_aliases=True)
+        )
@@ -18,12 +18,24 @@
 """
 Product Store Service with UI
 """
+import hashlib
+from datetime import datetime, timezone
 from flask import jsonify, request, abort
-from flask import url_for
+from flask import url_for, Response, stream_with_context
+from werkzeug.http import http_date, parse_date, quote_etag, unquote_etag
 from service.common import status
-from service.models import Product, Category
+from service.common.compression import ENCODINGS
+from service.common import pagination
+from service.common.arguments import get_boolean, get_category, get_cursor, get_filters, get_page_size
+from service.common.arguments import if_match_versions, version_etag
+from service.common.pagination import encode_cursor
+from service.common.replicas import read_only
+from service.models import Product, DataValidationError, cache_stats, database_ready, pool_stats
 from . import app
 
+JSON_MIMETYPE = "application/json"
+NDJSON_MIMETYPE = "application/x-ndjson"
+
 
 ######################################################################
 # H E A L T H   C H E C K
@@ -34,6 +46,29 @@ def healthcheck():
     return jsonify(status=200, message="OK"), status.HTTP_200_OK
 
 
+@app.route("/health/ready")
+def readiness():
+    """Let them know if we can serve requests from the database"""
+    if not database_ready():
+        return (
+            jsonify(status=503, message="Database is not ready"),
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+    return jsonify(status=200, message="OK"), status.HTTP_200_OK
+
+
+@app.route("/cache/stats")
+def product_cache_stats():
+    """Returns the hit, miss and eviction counters of the Product cache"""
+    return jsonify(cache_stats()), status.HTTP_200_OK
+
+
+@app.route("/pool/stats")
+def database_pool_stats():
+    """Returns how much of the database connection pool is in use"""
+    return jsonify(pool_stats()), status.HTTP_200_OK
+
+
 ######################################################################
 # H O M E   P A G E
 ######################################################################
@@ -65,6 +100,63 @@ def check_content_type(content_type):
     )
 
 
+def make_etag(*parts):
+    """Returns a strong entity tag for the parts that identify a response"""
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+
+def validators(etag, last_modified):
+    """Returns the ETag and Last-Modified headers for a response"""
+    headers = {"ETag": quote_etag(etag)}
+    if last_modified:
+        headers["Last-Modified"] = http_date(last_modified.replace(tzinfo=timezone.utc))
+    return headers
+
+
+def is_not_modified(headers):
+    """Checks if the copy the client has cached is still current"""
+    if request.if_none_match:
+        # the client may hold a compressed representation of the same body
+        etag = unquote_etag(headers["ETag"])[0]
+        tags = [etag] + [f"{etag}-{encoding}" for encoding in ENCODINGS]
+        return any(request.if_none_match.contains(tag) for tag in tags)
+    if request.if_modified_since and "Last-Modified" in headers:
+        return parse_date(headers["Last-Modified"]) <= request.if_modified_since
+    return False
+
+
+def wants_stream():
+    """Checks if the client asked for a streamed NDJSON response"""
+    if request.args.get("stream", "").lower() == "true":
+        return True
+    best = request.accept_mimetypes.best_match([JSON_MIMETYPE, NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+
+def stream_products(products, sort, fields, rank=None):
+    """Streams a Product query back as newline delimited JSON"""
+    after = get_cursor(request.args)
+    batch_size = app.config["STREAM_BATCH_SIZE"]
+
+    def generate():
+        count = 0
+        for product in pagination.stream(products, after, sort, batch_size, fields, rank):
+            count += 1
+            yield app.json.dumps(product) + "\n"
+        app.logger.info("[%s] Products streamed", count)
+
+    app.logger.info("Streaming Products...")
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+
+def next_page_link(sort_key, limit):
+    """Builds the Link header that points to the next page"""
+    args = request.args.to_dict()
+    args.update(cursor=encode_cursor(sort_key), limit=limit)
+    next_url = url_for("list_products", _external=True, **args)
+    return f'<{next_url}>; rel="next"'
+
+
 ######################################################################
 # C R E A T E   A   N E W   P R O D U C T
 ######################################################################
@@ -78,7 +170,8 @@ def create_products():
     check_content_type("application/json")
 
     data = request.get_json()
-    app.logger.info("Processing: %s", data)
+    if app.config["LOG_PAYLOADS"]:
+        app.logger.info("Processing: %s", data)
     product = Product()
     product.deserialize(data)
     product.create()
@@ -95,6 +188,92 @@ def create_products():
     return jsonify(message), status.HTTP_201_CREATED, {"Location": location_url}
 
 
+######################################################################
+# C R E A T E   P R O D U C T S   I N   B U L K
+######################################################################
+@app.route("/products/bulk", methods=["POST"])
+def create_products_bulk():
+    """
+    Creates many Products
+    This endpoint will create every valid Product in the posted JSON array
+    in a single transaction and report the items that could not be created
+    """
+    app.logger.info("Request to Create Products in bulk...")
+    check_content_type("application/json")
+
+    data = request.get_json()
+    if not isinstance(data, list) or not data:
+        abort(status.HTTP_400_BAD_REQUEST, "Request body must be a non-empty JSON array")
+
+    products = []
+    errors = []
+    for position, item in enumerate(data):
+        try:
+            products.append(Product().deserialize(item))
+        except DataValidationError as error:
+            errors.append({"index": position, "message": str(error)})
+
+    created = []
+    if products:
+        created = Product.create_bulk(products, app.config["BULK_CHUNK_SIZE"])
+    app.logger.info("[%s] Products created, [%s] rejected", len(created), len(errors))
+
+    message = {
+        "created": [product.serialize() for product in created],
+        "errors": errors,
+    }
+    if not created:
+        return jsonify(message), status.HTTP_400_BAD_REQUEST
+    if errors:
+        return jsonify(message), status.HTTP_207_MULTI_STATUS
+    return jsonify(message), status.HTTP_201_CREATED
+
+
+######################################################################
+# P R O D U C T   S T A T I S T I C S
+######################################################################
+@app.route("/products/stats", methods=["GET"])
+@read_only
+def product_stats():
+    """
+    Returns statistics for each Category
+    The count, number available and min/avg/max price of the Products in
+    every Category. Pass fresh=true to skip the cached result.
+    """
+    app.logger.info("Request for Product statistics...")
+    fresh = request.args.get("fresh", "").lower() == "true"
+    stats = Product.stats(cached=app.config["STATS_CACHED"] and not fresh)
+    return jsonify(stats), status.HTTP_200_OK
+
+
+######################################################################
+# P R O D U C T   C H A N G E S
+######################################################################
+@app.route("/products/changes", methods=["GET"])
+def product_changes():
+    """
+    Returns the Products changed since a token
+    Every Product created, updated or deleted after the ``since`` token is
+    returned oldest first, with deleted Products marked by ``deleted_at``.
+    Pass the ``next`` token of the response as ``since`` to get the changes
+    after these. Leave out ``since`` to start from the beginning.
+    """
+    app.logger.info("Request for Product changes...")
+    since = get_cursor(request.args, "since")
+    limit = get_page_size(request.args, app.config)
+    products, has_more = pagination.changes(since, limit, app.config["CHANGES_LAG"])
+    changes = []
+    for product in products:
+        change = product.serialize()
+        change["deleted_at"] = product.deleted_at.isoformat() if product.deleted_at else None
+        changes.append(change)
+    token = request.args.get("since")
+    if products:
+        token = encode_cursor(pagination.sort_key(products[-1], Product.CHANGES_SORT))
+    app.logger.info("[%s] Product changes returned", len(changes))
+    return jsonify(changes=changes, next=token, has_more=has_more), status.HTTP_200_OK
+
+
 ######################################################################
 # L I S T   A L L   P R O D U C T S
 ######################################################################
@@ -108,18 +287,33 @@ def create_products():
 ######################################################################
 
 @app.route("/products/<int:product_id>", methods=["GET"])
+@read_only
 def get_products(product_id):
     """
     Retrieve a single Product
-    This endpoint will return a Product based on it's id
+    This endpoint will return a Product based on it's id, or only the
+    fields listed in the fields query parameter
     """
     app.logger.info("Request to Retrieve a product with id [%s]", product_id)
-    product = Product.find(product_id)
+    fields = Product.parse_fields(request.args.get("fields"))
+    if fields:
+        product = pagination.find_fields(product_id, fields)
+    else:
+        product = Product.find_cached(product_id)
     if not product:
         abort(status.HTTP_404_NOT_FOUND, f"Product with id '{product_id}' was not found.")
-    app.logger.info("Returning product: %s", product.name)
-    # return product.serialize(), status.HTTP_200_OK
-    return jsonify(product.serialize()), status.HTTP_200_OK
+    updated_at = product.get("updated_at")
+    if isinstance(updated_at, str):
+        updated_at = datetime.fromisoformat(updated_at)
+    if "version" in product:
+        etag = version_etag(product["version"])
+    else:
+        etag = make_etag(app.json.dumps(product))
+    headers = validators(etag, updated_at)
+    if is_not_modified(headers):
+        return "", status.HTTP_304_NOT_MODIFIED, headers
+    app.logger.info("Returning product: %s", product_id)
+    return jsonify(product), status.HTTP_200_OK, headers
 
 
 ######################################################################
@@ -133,17 +327,73 @@ def get_products(product_id):
 def update_products(product_id):
     """
     Update a Product
-    This endpoint will update a Product based the body that is posted
+    This endpoint will update a Product based the body that is posted.
+    Send the ETag of the Product in If-Match to only update that version.
     """
     app.logger.info("Request to Update a product with id [%s]", product_id)
     check_content_type("application/json")
     product = Product.find(product_id)
     if not product:
         abort(status.HTTP_404_NOT_FOUND, f"Product with id '{product_id}' was not found.")
+    versions = if_match_versions(request.if_match)
+    if versions is not None and product.version not in versions:
+        # the client may have read a stale copy from this worker's cache
+        Product.cache.delete(str(product_id))
+        abort(status.HTTP_412_PRECONDITION_FAILED, f"Product with id '{product_id}' was changed by someone else")
     product.deserialize(request.get_json())
     product.id = product_id
     product.update()
-    return product.serialize(), status.HTTP_200_OK
+    return product.serialize(), status.HTTP_200_OK, {"ETag": quote_etag(version_etag(product.version))}
+
+
+######################################################################
+# P A R T I A L L Y   U P D A T E   P R O D U C T S
+######################################################################
+@app.route("/products/<int:product_id>", methods=["PATCH"])
+def patch_products(product_id):
+    """
+    Partially update a Product
+    Only the fields in the body are changed, with a single UPDATE statement.
+    Send the ETag of the Product in If-Match to only update that version.
+    """
+    app.logger.info("Request to Patch a product with id [%s]", product_id)
+    check_content_type("application/json")
+    product = Product.patch(product_id, Product.parse_changes(request.get_json()), if_match_versions(request.if_match))
+    if not product:
+        abort(status.HTTP_404_NOT_FOUND, f"Product with id '{product_id}' was not found.")
+    return product.serialize(), status.HTTP_200_OK, {"ETag": quote_etag(version_etag(product.version))}
+
+
+@app.route("/products", methods=["PATCH"])
+def patch_all_products():
+    """
+    Partially update many Products
+    The body holds the ``changes`` to make to every Product with one of the
+    ``ids`` and/or in the ``category`` and with the ``available`` given,
+    for example {"category": "FOOD", "changes": {"available": false}}.
+    Send {"all": true} instead of a filter to change every Product.
+    They are all changed by a single UPDATE statement.
+    """
+    app.logger.info("Request to Patch many products")
+    check_content_type("application/json")
+    data = request.get_json()
+    if not isinstance(data, dict):
+        abort(status.HTTP_400_BAD_REQUEST, "Invalid update: body of request contained bad or no data")
+    changes = Product.parse_changes(data.get("changes"))
+    ids = data.get("ids")
+    if ids is not None and not (
+        isinstance(ids, list) and all(isinstance(value, int) and not isinstance(value, bool) for value in ids)
+    ):
+        abort(status.HTTP_400_BAD_REQUEST, "Invalid ids: must be a list of integers")
+    category = data.get("category")
+    available = data.get("available")
+    if available is not None and not isinstance(available, bool):
+        abort(status.HTTP_400_BAD_REQUEST, f"Invalid type for boolean [available]: {type(available)}")
+    if ids is None and category is None and available is None and data.get("all") is not True:
+        abort(status.HTTP_400_BAD_REQUEST, 'Invalid update: give ids, category or available, or "all": true')
+    count = Product.update_all(changes, ids, get_category(category) if category else None, available)
+    app.logger.info("[%s] Products updated", count)
+    return {"updated": count}, status.HTTP_200_OK
 
 ######################################################################
 # D E L E T E   A   P R O D U C T
@@ -168,11 +418,18 @@ def delete_products(product_id):
 
 @app.route("/products", methods=["DELETE"])
 def delete_all_products():
-    """Delete all products (used for test setup)"""
+    """
+    Delete all Products
+    This endpoint will delete every Product, or only those matching the
+    category and/or available query parameters, in a single statement
+    """
     app.logger.info("Request to delete ALL products")
-    products = Product.all()
-    for product in products:
-        product.delete()
+    category = request.args.get("category")
+    count = Product.delete_all(
+        category=get_category(category) if category else None,
+        available=get_boolean(request.args, "available"),
+    )
+    app.logger.info("[%s] Products deleted", count)
     return "", status.HTTP_204_NO_CONTENT
 
 
@@ -180,29 +437,51 @@ def delete_all_products():
 # LIST PRODUCTS
 ######################################################################
 @app.route("/products", methods=["GET"])
+@read_only
 def list_products():
-    """Returns a list of Products"""
+    """Returns a list of Products
+
+    Any combination of ``name``, ``category``, ``available``, ``min_price``
+    and ``max_price`` narrows the list and ``sort`` orders it, for example
+    ``sort=price,-name``. ``q=ham`` searches the names and descriptions and
+    sorts the best matches first. ``fields=id,name,price`` returns only
+    those fields. The Products are returned a page at a time, of ``limit``
+    or PAGE_SIZE_DEFAULT Products, and the URL of the next page is in the
+    ``Link`` header. Send ``Accept: application/x-ndjson`` or
+    ``stream=true`` to stream every matching Product as one JSON document
+    per line instead, for example to export the whole catalog.
+    """
     app.logger.info("Request to list Products...")
-    products = []
-    name = request.args.get("name")
-    category = request.args.get("category")
-    available = request.args.get("available")
-
-    if name:
-        app.logger.info("Find by name: %s", name)
-        products = Product.find_by_name(name)
-    elif category:
-        app.logger.info("Find by category: %s", category)
-        # create enum from string
-        category_value = getattr(Category, category.upper())
-        products = Product.find_by_category(category_value)
-    elif available is not None:
-        is_available = available.lower() == "true"
-        app.logger.info("Find by availability: %s", is_available)
-        products = Product.find_by_availability(is_available)
-    else:
-        app.logger.info("Find all")
-        products = Product.all()
-    results = [product.serialize() for product in products]
+    products = Product.find_by_filters(**get_filters(request.args))
+    text = request.args.get("q", "").strip()
+    rank = None
+    if text:
+        products = Product.search(products, text)
+        rank = Product.search_rank(text)
+    sort = pagination.parse_sort(request.args.get("sort"), search=rank is not None)
+    fields = Product.parse_fields(request.args.get("fields")) or list(Product.FIELDS)
+
+    if wants_stream():
+        return stream_products(products, sort, fields, rank)
+
+    limit = get_page_size(request.args, app.config)
+    after = get_cursor(request.args)
+    selection = pagination.keyset(products, sort, after, rank).limit(limit + 1)
+
+    # validate the client's copy without loading any of the rows. There is
+    # no Last-Modified because the newest visible row does not move forward
+    # when a row is deleted or leaves the filter, but the ETag changes.
+    headers = validators(make_etag(request.full_path, *Product.fingerprint(selection)), None)
+    if is_not_modified(headers):
+        return "", status.HTTP_304_NOT_MODIFIED, headers
+
+    # the cursor needs the sort keys even if the client did not ask for them
+    extra = [name for name, _ in sort if name not in fields]
+    results, has_more = pagination.paginate(products, limit, after, sort, fields + extra, rank)
+    if has_more:
+        headers["Link"] = next_page_link(pagination.sort_key(results[-1], sort), limit)
+    if extra:
+        results = [{name: result[name] for name in fields} for result in results]
+
     app.logger.info("[%s] Products returned", len(results))
-    return results, status.HTTP_200_OK
+    return results, status.HTTP_200_OK, headers
@@ -33,6 +33,13 @@ $(function () {
         $("#flash_message").append(message);
     }
 
+    // Returns the URL of the next page from the Link header, if there is one
+    function next_page_url(xhr) {
+        let link = xhr.getResponseHeader("Link");
+        let match = link ? link.match(/<([^>]+)>;\s*rel="next"/) : null;
+        return match ? match[1] : null;
+    }
+
     // ****************************************
     // Create a Product
     // ****************************************
@@ -218,14 +225,34 @@ $(function () {
 
         $("#flash_message").empty();
 
-        let ajax = $.ajax({
-            type: "GET",
-            url: `/products?${queryString}`,
-            contentType: "application/json",
-            data: ''
-        })
+        let results = [];
 
-        ajax.done(function(res){
+        // the products are listed a page at a time, so follow the Link
+        // header until the last page has been read
+        function get_page(url) {
+            let ajax = $.ajax({
+                type: "GET",
+                url: url,
+                contentType: "application/json",
+                data: ''
+            })
+
+            ajax.done(function(res, textStatus, xhr){
+                results = results.concat(res);
+                let next_url = next_page_url(xhr);
+                if (next_url) {
+                    get_page(next_url);
+                } else {
+                    show_results(results);
+                }
+            });
+
+            ajax.fail(function(res){
+                flash_message(res.responseJSON.message)
+            });
+        }
+
+        function show_results(res) {
             //alert(res.toSource())
             $("#search_results").empty();
             let table = '<table class="table table-striped" cellpadding="10">'
@@ -254,11 +281,9 @@ $(function () {
             }
 
             flash_message("Success")
-        });
+        }
 
-        ajax.fail(function(res){
-            flash_message(res.responseJSON.message)
-        });
+        get_page(`/products?${queryString}`);
 
     });
 
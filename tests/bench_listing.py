@@ -0,0 +1,61 @@
+"""
+Benchmark for serializing large Product listings
+
+Compares loading ORM Products and encoding them with the standard json
+module against serialize_rows() and the app's JSON provider.
+
+Run it with:
+    python -m tests.bench_listing [rows]
+
+It uses an in-memory SQLite database unless DATABASE_URI is set.
+"""
+import os
+import sys
+import json
+import time
+
+os.environ.setdefault("DATABASE_URI", "sqlite://")
+
+# pylint: disable=wrong-import-position
+from service import app  # noqa: E402
+from service.common.pagination import keyset, serialize_rows  # noqa: E402
+from service.models import db, Product  # noqa: E402
+from tests.factories import ProductFactory  # noqa: E402
+
+
+def orm_listing():
+    """Serializes a listing the way list_products used to"""
+    return json.dumps([product.serialize() for product in Product.all()]).encode("utf-8")
+
+
+def row_listing():
+    """Serializes a listing from column tuples with the JSON provider"""
+    return app.json.dumps_bytes(list(serialize_rows(keyset(Product.query))))
+
+
+def timeit(function, repeat: int = 5) -> float:
+    """Returns the best time of several runs"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+        db.session.expunge_all()
+    return best
+
+
+def main(rows: int = 10_000):
+    """Loads the rows and prints the throughput of both paths"""
+    Product.delete_all()
+    Product.create_bulk(ProductFactory.build_batch(rows), chunk_size=1000)
+    print(f"{rows} rows, JSON encoder: {'orjson' if app.json.use_orjson else 'json'}")
+    baseline = timeit(orm_listing)
+    optimized = timeit(row_listing)
+    for label, seconds in (("ORM + serialize()", baseline), ("serialize_rows()", optimized)):
+        print(f"{label:>20}: {seconds * 1000:8.1f} ms  {rows / seconds:12,.0f} rows/s")
+    print(f"{'speedup':>20}: {baseline / optimized:8.1f}x")
+    Product.delete_all()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -0,0 +1,52 @@
+"""
+Test cases for the Request Arguments
+"""
+from decimal import Decimal
+from unittest import TestCase
+from werkzeug.exceptions import BadRequest
+from werkzeug.http import parse_etags
+from service.common import arguments
+from service.common.pagination import encode_cursor
+from service.models import Category
+
+SETTINGS = {"PAGE_SIZE_DEFAULT": 20, "PAGE_SIZE_MAX": 100}
+
+
+class TestArguments(TestCase):
+    """Test the parsing of query parameters and headers"""
+
+    def test_get_filters(self):
+        """It should turn the query parameters into filters"""
+        filters = arguments.get_filters({"name": "Hat", "category": "food", "available": "False", "min_price": "1.5"})
+        self.assertEqual(
+            filters,
+            {"name": "Hat", "category": Category.FOOD, "available": False, "min_price": Decimal("1.5"), "max_price": None},
+        )
+        self.assertEqual(arguments.get_filters({"name": ""})["name"], None)
+        self.assertRaises(BadRequest, arguments.get_filters, {"category": "spaceships"})
+        self.assertRaises(BadRequest, arguments.get_filters, {"max_price": "free"})
+
+    def test_get_boolean(self):
+        """It should only accept true or false"""
+        self.assertTrue(arguments.get_boolean({"available": "TRUE"}, "available"))
+        self.assertIsNone(arguments.get_boolean({}, "available"))
+        self.assertRaises(BadRequest, arguments.get_boolean, {"available": "yes"}, "available")
+
+    def test_get_page_size(self):
+        """It should cap the page size at the maximum"""
+        self.assertEqual(arguments.get_page_size({}, SETTINGS), 20)
+        self.assertEqual(arguments.get_page_size({"limit": "500"}, SETTINGS), 100)
+        self.assertRaises(BadRequest, arguments.get_page_size, {"limit": "0"}, SETTINGS)
+        self.assertRaises(BadRequest, arguments.get_page_size, {"limit": "ten"}, SETTINGS)
+
+    def test_get_cursor(self):
+        """It should decode the cursor it is given"""
+        self.assertEqual(arguments.get_cursor({"since": encode_cursor([7])}, "since"), [7])
+        self.assertIsNone(arguments.get_cursor({}))
+        self.assertRaises(BadRequest, arguments.get_cursor, {"cursor": "%%%"})
+
+    def test_if_match_versions(self):
+        """It should read the Product versions out of If-Match"""
+        self.assertIsNone(arguments.if_match_versions(parse_etags(None)))
+        self.assertIsNone(arguments.if_match_versions(parse_etags("*")))
+        self.assertEqual(sorted(arguments.if_match_versions(parse_etags('"v2", "v3-gzip", "x"'))), [2, 3])
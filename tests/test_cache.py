@@ -0,0 +1,138 @@
+"""
+Test cases for the Cache Handlers
+"""
+import fnmatch
+from unittest import TestCase
+from flask import Flask
+from service.common.cache import LRUCache, SharedCache, init_cache
+
+
+class FakeClock:
+    """A clock that only moves when told to"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds: float):
+        """Moves the clock forward"""
+        self.now += seconds
+
+
+class LocalRedis:
+    """A dictionary that stands in for a Redis client"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        """Returns the value of a key"""
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):  # pylint: disable=unused-argument
+        """Sets the value of a key"""
+        self.data[key] = value
+
+    def delete(self, *keys):
+        """Removes keys"""
+        for key in keys:
+            self.data.pop(key, None)
+
+    def scan_iter(self, match="*"):
+        """Iterates over the keys that match a pattern"""
+        return [key for key in list(self.data) if fnmatch.fnmatch(key, match)]
+
+
+class TestLRUCache(TestCase):
+    """Test the in-process cache"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = LRUCache(maxsize=2, ttl=10, clock=self.clock)
+
+    def test_get_and_set(self):
+        """It should return what was stored and count hits and misses"""
+        self.assertIsNone(self.cache.get("1"))
+        self.cache.set("1", {"id": 1})
+        self.assertEqual(self.cache.get("1"), {"id": 1})
+        stats = self.cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["size"], 1)
+
+    def test_expires_entries(self):
+        """It should expire entries after the ttl"""
+        self.cache.set("1", "one")
+        self.clock.advance(10)
+        self.assertIsNone(self.cache.get("1"))
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_evicts_least_recently_used(self):
+        """It should evict the least recently used entry when full"""
+        self.cache.set("1", "one")
+        self.cache.set("2", "two")
+        self.cache.get("1")
+        self.cache.set("3", "three")
+        self.assertIsNone(self.cache.get("2"))
+        self.assertEqual(self.cache.get("1"), "one")
+        self.assertEqual(self.cache.get("3"), "three")
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_delete_and_clear(self):
+        """It should invalidate entries"""
+        self.cache.set("1", "one")
+        self.cache.set("2", "two")
+        self.cache.delete("1", "3")
+        self.assertIsNone(self.cache.get("1"))
+        self.cache.clear()
+        self.assertIsNone(self.cache.get("2"))
+
+    def test_disabled(self):
+        """It should not store anything when maxsize is 0"""
+        cache = LRUCache(maxsize=0)
+        cache.set("1", "one")
+        self.assertIsNone(cache.get("1"))
+
+
+class TestSharedCache(TestCase):
+    """Test the shared cache against a local stand-in"""
+
+    def setUp(self):
+        self.client = LocalRedis()
+        self.cache = SharedCache(self.client, ttl=10)
+
+    def test_get_and_set(self):
+        """It should store JSON in the backend"""
+        self.assertIsNone(self.cache.get("1"))
+        self.cache.set("1", {"id": 1})
+        self.assertIn("products:1", self.client.data)
+        self.assertEqual(self.cache.get("1"), {"id": 1})
+        stats = self.cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+    def test_delete_and_clear(self):
+        """It should invalidate entries with its prefix only"""
+        self.client.set("other", "keep")
+        self.cache.set("1", "one")
+        self.cache.set("2", "two")
+        self.cache.delete("1")
+        self.assertIsNone(self.cache.get("1"))
+        self.cache.clear()
+        self.assertIsNone(self.cache.get("2"))
+        self.assertEqual(self.client.get("other"), "keep")
+
+
+class TestInitCache(TestCase):
+    """Test building the cache from the configuration"""
+
+    def test_memory_cache(self):
+        """It should build an LRUCache by default"""
+        app = Flask(__name__)
+        app.config.update(CACHE_MAXSIZE=5, CACHE_TTL=3)
+        cache = init_cache(app)
+        self.assertIsInstance(cache, LRUCache)
+        self.assertEqual(cache.maxsize, 5)
+        self.assertEqual(cache.ttl, 3)
@@ -5,7 +5,8 @@ import os
 from unittest import TestCase
 from unittest.mock import patch, MagicMock
 from click.testing import CliRunner
-from service.common.cli_commands import db_create
+from sqlalchemy.exc import SQLAlchemyError
+from service.common.cli_commands import db_create, db_index, db_init, db_purge
 
 
 class TestFlaskCLI(TestCase):
@@ -21,3 +22,41 @@ class TestFlaskCLI(TestCase):
         with patch.dict(os.environ, {"FLASK_APP": "service:app"}, clear=True):
             result = self.runner.invoke(db_create)
             self.assertEqual(result.exit_code, 0)
+
+    @patch('service.common.cli_commands.Product')
+    def test_db_init(self, product_mock):
+        """It should call the db-init command"""
+        with patch.dict(os.environ, {"FLASK_APP": "service:app"}, clear=True):
+            result = self.runner.invoke(db_init)
+            self.assertEqual(result.exit_code, 0)
+        product_mock.create_tables.assert_called_once()
+
+    @patch('service.common.cli_commands.Product')
+    def test_db_index(self, product_mock):
+        """It should call the db-index command"""
+        product_mock.create_indexes.return_value = ["ix_product_price"]
+        with patch.dict(os.environ, {"FLASK_APP": "service:app"}, clear=True):
+            result = self.runner.invoke(db_index)
+            self.assertEqual(result.exit_code, 0)
+            self.assertIn("ix_product_price", result.output)
+        product_mock.create_indexes.assert_called_once()
+
+    @patch('service.common.cli_commands.Product')
+    def test_db_index_failed(self, product_mock):
+        """It should report an index that could not be built"""
+        product_mock.create_indexes.side_effect = SQLAlchemyError("Index ix_product_price could not be built")
+        with patch.dict(os.environ, {"FLASK_APP": "service:app"}, clear=True):
+            result = self.runner.invoke(db_index)
+            self.assertNotEqual(result.exit_code, 0)
+            self.assertIn("ix_product_price could not be built", result.output)
+            self.assertNotIn("is in place", result.output)
+
+    @patch('service.common.cli_commands.Product')
+    def test_db_purge(self, product_mock):
+        """It should call the db-purge command"""
+        product_mock.purge.return_value = 3
+        with patch.dict(os.environ, {"FLASK_APP": "service:app"}, clear=True):
+            result = self.runner.invoke(db_purge, ["--days", "7"])
+            self.assertEqual(result.exit_code, 0)
+            self.assertIn("Purged 3", result.output)
+        product_mock.purge.assert_called_once()
@@ -0,0 +1,77 @@
+"""
+Test cases for Response Compression
+"""
+import gzip
+import zlib
+from unittest import TestCase
+from flask import Flask, Response, jsonify
+from service.common.compression import init_compression, compress_stream
+
+
+class TestCompression(TestCase):
+    """Test the negotiated compression of responses"""
+
+    def setUp(self):
+        app = Flask(__name__)
+        app.config["COMPRESS_MIN_SIZE"] = 100
+        init_compression(app)
+
+        @app.route("/big")
+        def big():
+            response = jsonify([{"category": "TOOLS", "name": "Hammer"}] * 50)
+            response.set_etag("abc")
+            return response
+
+        @app.route("/small")
+        def small():
+            return jsonify(name="Hammer")
+
+        @app.route("/text")
+        def text():
+            return "plain " * 100
+
+        @app.route("/stream")
+        def stream():
+            return Response((f'{{"id": {n}}}\n' for n in range(100)), mimetype="application/x-ndjson")
+
+        self.client = app.test_client()
+
+    def test_gzip(self):
+        """It should gzip large JSON responses when the client accepts it"""
+        response = self.client.get("/big", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response.headers["Vary"])
+        self.assertEqual(response.headers["ETag"], '"abc-gzip"')
+        body = gzip.decompress(response.data)
+        self.assertIn(b"Hammer", body)
+        self.assertLess(len(response.data), len(body))
+
+    def test_not_accepted(self):
+        """It should not compress when the client does not accept it"""
+        response = self.client.get("/big")
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertIn("Accept-Encoding", response.headers["Vary"])
+        response = self.client.get("/big", headers={"Accept-Encoding": "identity"})
+        self.assertNotIn("Content-Encoding", response.headers)
+
+    def test_threshold_and_mimetype(self):
+        """It should not compress small or non JSON responses"""
+        response = self.client.get("/small", headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("Content-Encoding", response.headers)
+        response = self.client.get("/text", headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("Content-Encoding", response.headers)
+
+    def test_stream(self):
+        """It should compress a streamed response chunk by chunk"""
+        response = self.client.get("/stream", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertNotIn("Content-Length", response.headers)
+        lines = gzip.decompress(response.data).decode("utf-8").splitlines()
+        self.assertEqual(len(lines), 100)
+
+    def test_stream_flushes_each_chunk(self):
+        """It should make every chunk decodable as soon as it is sent"""
+        chunks = compress_stream(iter(["first\n", "second\n"]), "gzip", 6)
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self.assertEqual(decoder.decompress(next(chunks)), b"first\n")
+        self.assertEqual(decoder.decompress(next(chunks)), b"second\n")
@@ -0,0 +1,45 @@
+"""
+Test cases for the Configuration
+"""
+from unittest import TestCase
+from service import config
+from service.config import engine_options
+
+SETTINGS = {
+    "DB_POOL_SIZE": 8,
+    "DB_MAX_OVERFLOW": 4,
+    "DB_POOL_TIMEOUT": 10,
+    "DB_POOL_RECYCLE": 600,
+    "DB_POOL_PRE_PING": True,
+    "DB_CONNECT_TIMEOUT": 5,
+    "DB_STATEMENT_TIMEOUT": 2000,
+}
+
+
+class TestEngineOptions(TestCase):
+    """Test the SQLAlchemy engine options"""
+
+    def test_postgresql_options(self):
+        """It should size the pool and set timeouts for PostgreSQL"""
+        options = engine_options(dict(SETTINGS, SQLALCHEMY_DATABASE_URI="postgresql://localhost/postgres"))
+        self.assertEqual(options["pool_size"], 8)
+        self.assertEqual(options["max_overflow"], 4)
+        self.assertEqual(options["pool_timeout"], 10)
+        self.assertEqual(options["pool_recycle"], 600)
+        self.assertTrue(options["pool_pre_ping"])
+        self.assertEqual(options["connect_args"]["connect_timeout"], 5)
+        self.assertEqual(options["connect_args"]["options"], "-c statement_timeout=2000")
+
+    def test_sqlite_options(self):
+        """It should leave the SQLite pool alone"""
+        options = engine_options(dict(SETTINGS, SQLALCHEMY_DATABASE_URI="sqlite:///test.db"))
+        self.assertNotIn("pool_size", options)
+        self.assertNotIn("connect_args", options)
+        self.assertTrue(options["pool_pre_ping"])
+
+    def test_defaults(self):
+        """It should have production defaults for the pool"""
+        settings = {name: getattr(config, name) for name in SETTINGS}
+        options = engine_options(dict(settings, SQLALCHEMY_DATABASE_URI="postgresql://localhost/postgres"))
+        self.assertGreater(options["pool_size"], 0)
+        self.assertGreater(options["pool_recycle"], 0)
@@ -0,0 +1,72 @@
+"""
+Test cases for the Gunicorn configuration
+"""
+import os
+import runpy
+import tempfile
+import multiprocessing
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+from service.models import db
+from service import app
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "gunicorn.conf.py")
+
+
+def load_config(**environ):
+    """Returns the settings of the configuration file in an environment"""
+    with patch.dict(os.environ, environ, clear=True):
+        return runpy.run_path(CONFIG_FILE)
+
+
+class TestGunicornConfig(TestCase):
+    """Gunicorn Configuration Tests"""
+
+    def test_gthread_defaults(self):
+        """It should run one threaded worker per core"""
+        config = load_config()
+        self.assertEqual(config["worker_class"], "gthread")
+        self.assertEqual(config["workers"], multiprocessing.cpu_count())
+        self.assertEqual(config["threads"], 4)
+        self.assertGreater(config["max_requests_jitter"], 0)
+        self.assertEqual(config["bind"], "0.0.0.0:8080")
+
+    def test_worker_classes(self):
+        """It should size the workers for the worker class"""
+        config = load_config(GUNICORN_WORKER_CLASS="sync")
+        self.assertEqual(config["workers"], multiprocessing.cpu_count() * 2 + 1)
+        self.assertEqual(config["threads"], 1)
+        config = load_config(GUNICORN_WORKER_CLASS="gevent", GUNICORN_WORKERS="2", PORT="5000")
+        self.assertEqual(config["workers"], 2)
+        self.assertEqual(config["threads"], 1)
+        self.assertEqual(config["bind"], "0.0.0.0:5000")
+
+    def test_post_fork_disposes_engine(self):
+        """It should not let a forked worker reuse the inherited connections"""
+        config = load_config()
+        with app.app_context():
+            with patch.object(db.engine, "dispose") as dispose_mock:
+                config["post_fork"](MagicMock(), MagicMock())
+        dispose_mock.assert_called_once_with(close=False)
+
+    @patch("prometheus_client.multiprocess.mark_process_dead")
+    def test_child_exit(self, mark_mock):
+        """It should drop the metrics of a worker that exited"""
+        config = load_config()
+        worker = MagicMock(pid=1234)
+        with patch.dict(os.environ, {"PROMETHEUS_MULTIPROC_DIR": "/tmp"}):
+            config["child_exit"](MagicMock(), worker)
+        mark_mock.assert_called_once_with(1234)
+
+    def test_on_starting_empties_metrics_directory(self):
+        """It should start with an empty directory for the metrics of the workers"""
+        config = load_config()
+        with tempfile.TemporaryDirectory() as parent:
+            directory = os.path.join(parent, "prometheus")
+            with patch.dict(os.environ, {"PROMETHEUS_MULTIPROC_DIR": directory}):
+                config["on_starting"](MagicMock())
+                self.assertTrue(os.path.isdir(directory))
+                with open(os.path.join(directory, "counter_1234.db"), "w", encoding="utf-8") as file:
+                    file.write("stale")
+                config["on_starting"](MagicMock())
+            self.assertEqual(os.listdir(directory), [])
@@ -0,0 +1,51 @@
+"""
+Test cases for the JSON Provider
+"""
+from datetime import datetime
+from decimal import Decimal
+from unittest import TestCase
+from flask import Flask
+from service.common.json_provider import FastJSONProvider
+from service.models import Category
+
+
+class TestFastJSONProvider(TestCase):
+    """Test the JSON encoding of Product payloads"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.json = FastJSONProvider(self.app)
+        self.data = {
+            "price": Decimal("12.50"),
+            "category": Category.TOOLS,
+            "updated_at": datetime(2023, 1, 2, 3, 4, 5),
+            "name": "Hammer",
+        }
+        self.expected = (
+            '{"category":"TOOLS","name":"Hammer","price":"12.50","updated_at":"2023-01-02T03:04:05"}'
+        )
+
+    def test_dumps(self):
+        """It should encode Decimals, Categories and datetimes"""
+        self.assertEqual(self.app.json.dumps(self.data).replace(" ", ""), self.expected)
+
+    def test_dumps_without_orjson(self):
+        """It should encode the same way with the standard library"""
+        self.app.json.use_orjson = False
+        self.assertEqual(self.app.json.dumps(self.data).replace(" ", ""), self.expected)
+        self.assertEqual(self.app.json.loads('{"a": [1, 2]}'), {"a": [1, 2]})
+
+    def test_dumps_unknown_type(self):
+        """It should not encode types it does not know about"""
+        self.assertRaises(TypeError, self.app.json.dumps, {"a": object()})
+
+    def test_loads(self):
+        """It should decode strings and bytes"""
+        self.assertEqual(self.app.json.loads(b'{"a": [1, 2]}'), {"a": [1, 2]})
+
+    def test_response(self):
+        """It should return JSON responses"""
+        with self.app.app_context():
+            response = self.app.json.response(self.data)
+        self.assertEqual(response.mimetype, "application/json")
+        self.assertEqual(response.get_data(as_text=True).replace(" ", "").strip(), self.expected)
@@ -0,0 +1,118 @@
+"""
+Test cases for the Log Handlers
+"""
+import json
+import logging
+from unittest import TestCase
+from service import app
+from service.common import log_handlers
+from service.common.log_handlers import JsonFormatter, RequestFilter, init_logging, parse_sample_rates
+
+
+class ListHandler(logging.Handler):
+    """Keeps the formatted records in a list"""
+
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+
+class TestLogHandlers(TestCase):
+    """Log Handlers Tests"""
+
+    def setUp(self):
+        self.handlers = app.logger.handlers
+        self.filters = app.logger.filters
+        self.level = app.logger.level
+        self.config = dict(app.config)
+        self.sink = ListHandler()
+        self.gunicorn_logger = logging.getLogger("tests.gunicorn")
+        self.gunicorn_logger.handlers = [self.sink]
+        self.gunicorn_logger.setLevel(logging.INFO)
+
+    def tearDown(self):
+        log_handlers.stop_listeners()
+        app.logger.handlers = self.handlers
+        app.logger.filters = self.filters
+        app.logger.setLevel(self.level)
+        app.config.update(self.config)
+
+    def test_json_formatter(self):
+        """It should format records as JSON with their extra fields"""
+        record = logging.LogRecord("service", logging.INFO, __file__, 1, "Product %s saved", (7,), None)
+        record.product_id = 7
+        entry = json.loads(JsonFormatter().format(record))
+        self.assertEqual(entry["message"], "Product 7 saved")
+        self.assertEqual(entry["level"], "INFO")
+        self.assertEqual(entry["product_id"], 7)
+        self.assertNotIn("args", entry)
+
+    def test_queued_json_logging(self):
+        """It should write records from a background thread as JSON"""
+        app.config.update(LOG_FORMAT="json", LOG_QUEUE=True)
+        init_logging(app, "tests.gunicorn")
+        self.assertIsInstance(app.logger.handlers[0], logging.handlers.QueueHandler)
+        with app.test_request_context("/products/7"):
+            app.logger.warning("Product %s is low on stock", 7)
+        log_handlers.stop_listeners()
+        entry = json.loads(self.sink.lines[-1])
+        self.assertEqual(entry["message"], "Product 7 is low on stock")
+        self.assertEqual(entry["path"], "/products/7")
+        self.assertEqual(entry["method"], "GET")
+
+    def test_queued_exception(self):
+        """It should write the exception of a queued record on its own"""
+        app.config.update(LOG_FORMAT="json", LOG_QUEUE=True)
+        init_logging(app, "tests.gunicorn")
+        try:
+            raise ValueError("out of stock")
+        except ValueError:
+            app.logger.exception("Product %s could not be saved", 7)
+        log_handlers.stop_listeners()
+        entry = json.loads(self.sink.lines[-1])
+        self.assertEqual(entry["message"], "Product 7 could not be saved")
+        self.assertIn("ValueError: out of stock", entry["exception"])
+
+    def test_queued_text_exception(self):
+        """It should write the traceback of a queued record after its message"""
+        app.config.update(LOG_FORMAT="text", LOG_QUEUE=True)
+        init_logging(app, "tests.gunicorn")
+        try:
+            raise ValueError("out of stock")
+        except ValueError:
+            app.logger.exception("Product could not be saved")
+        log_handlers.stop_listeners()
+        message, traceback = self.sink.lines[-1].split("\n", 1)
+        self.assertTrue(message.endswith("Product could not be saved"))
+        self.assertIn("ValueError: out of stock", traceback)
+
+    def test_unqueued_logging(self):
+        """It should write records directly when the queue is turned off"""
+        app.config.update(LOG_FORMAT="text", LOG_QUEUE=False)
+        init_logging(app, "tests.gunicorn")
+        self.assertEqual(app.logger.handlers, [self.sink])
+        app.logger.info("Hello")
+        self.assertTrue(self.sink.lines[-1].endswith("Hello"))
+
+    def test_parse_sample_rates(self):
+        """It should parse the sample rate of each endpoint"""
+        self.assertEqual(parse_sample_rates(""), {})
+        self.assertEqual(
+            parse_sample_rates("list_products=0.01, get_products=1"), {"list_products": 0.01, "get_products": 1.0}
+        )
+        self.assertRaises(ValueError, parse_sample_rates, "list_products=often")
+
+    def test_sampling(self):
+        """It should drop the INFO lines of sampled out requests only"""
+        sampler = RequestFilter({"list_products": 0.0})
+        info = logging.LogRecord("service", logging.INFO, __file__, 1, "listed", None, None)
+        error = logging.LogRecord("service", logging.ERROR, __file__, 1, "failed", None, None)
+        self.assertTrue(sampler.filter(info))
+        with app.test_request_context("/products"):
+            self.assertFalse(sampler.filter(info))
+            self.assertTrue(sampler.filter(error))
+        with app.test_request_context("/products/1"):
+            self.assertTrue(sampler.filter(info))
@@ -0,0 +1,49 @@
+"""
+Test cases for the Metrics
+"""
+from service import app
+from service.common import status
+from tests.database import DatabaseTestCase
+from tests.factories import ProductFactory
+
+
+class TestMetrics(DatabaseTestCase):
+    """Test the /metrics endpoint"""
+
+    def setUp(self):
+        """Runs before each test"""
+        super().setUp()
+        self.client = app.test_client()
+
+    def _sample(self, body, name, **labels):
+        """Returns the value of one sample in the metrics text"""
+        label_text = ",".join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+        prefix = f"{name}{{{label_text}}} " if labels else f"{name} "
+        for line in body.splitlines():
+            if line.startswith(prefix):
+                return float(line[len(prefix):])
+        return 0.0
+
+    def test_metrics(self):
+        """It should count requests, latency, queries and pool use per route"""
+        before = self._sample(
+            self.client.get("/metrics").get_data(as_text=True),
+            "http_requests_total", endpoint="create_products", method="POST", status="201"
+        )
+        response = self.client.post("/products", json=ProductFactory().serialize())
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.client.get("/products")
+
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.content_type.startswith("text/plain"))
+        body = response.get_data(as_text=True)
+        after = self._sample(body, "http_requests_total", endpoint="create_products", method="POST", status="201")
+        self.assertEqual(after, before + 1)
+        self.assertGreater(
+            self._sample(body, "http_request_duration_seconds_count", endpoint="list_products", method="GET"), 0
+        )
+        self.assertGreater(self._sample(body, "db_queries_per_request_sum", endpoint="create_products"), 0)
+        self.assertGreater(self._sample(body, "http_response_size_bytes_count", endpoint="list_products"), 0)
+        self.assertIn("db_pool_connections", body)
+        self.assertIn("product_cache_events", body)
@@ -0,0 +1,162 @@
+"""
+Test cases for the Pagination helpers
+"""
+from unittest import TestCase
+from service import app
+from service.common import pagination
+from service.common.pagination import encode_cursor, decode_cursor
+from service.models import DataValidationError, Product
+from tests.database import DatabaseTestCase
+from tests.factories import ProductFactory
+
+
+class TestPagination(TestCase):
+    """Test Cursor Encoding"""
+
+    def test_round_trip(self):
+        """It should decode the keys that were encoded"""
+        cursor = encode_cursor([42, "Hammer"])
+        self.assertNotIn("=", cursor)
+        self.assertEqual(decode_cursor(cursor), [42, "Hammer"])
+
+    def test_decode_invalid_cursor(self):
+        """It should raise ValueError for a cursor it did not create"""
+        self.assertRaises(ValueError, decode_cursor, "%%%")
+        self.assertRaises(ValueError, decode_cursor, "bm90IGpzb24")
+        self.assertRaises(ValueError, decode_cursor, encode_cursor([]))
+
+
+class TestKeysetPagination(DatabaseTestCase):
+    """Test Paging, Streaming and Serializing Product Queries"""
+
+    ######################################################################
+    #  T E S T   C A S E S
+    ######################################################################
+
+    def test_changes(self):
+        """It should return the changes after a token in update order"""
+        products = ProductFactory.create_batch(3)
+        for product in products:
+            product.create()
+        products[0].available = not products[0].available
+        products[0].update()
+        products[1].delete()
+        changes, has_more = pagination.changes(limit=2)
+        self.assertTrue(has_more)
+        self.assertEqual([change.id for change in changes], [products[2].id, products[0].id])
+        token = pagination.sort_key(changes[-1], Product.CHANGES_SORT)
+        changes, has_more = pagination.changes(token, limit=2)
+        self.assertFalse(has_more)
+        self.assertEqual([change.id for change in changes], [products[1].id])
+        self.assertIsNotNone(changes[0].deleted_at)
+        self.assertEqual(pagination.changes(pagination.sort_key(changes[-1], Product.CHANGES_SORT)), ([], False))
+        # recent changes are held back for the lag
+        self.assertEqual(pagination.changes(lag=60), ([], False))
+        self.assertRaises(DataValidationError, pagination.changes, ["yesterday", 1])
+
+    def test_paginate_products(self):
+        """It should return Products one page at a time"""
+        for product in ProductFactory.create_batch(5):
+            product.create()
+        page, has_more = pagination.paginate(Product.query, 3)
+        self.assertEqual(len(page), 3)
+        self.assertTrue(has_more)
+        self.assertEqual([product.id for product in page], sorted(product.id for product in page))
+        rest, has_more = pagination.paginate(Product.query, 3, pagination.sort_key(page[-1]))
+        self.assertEqual(len(rest), 2)
+        self.assertFalse(has_more)
+        self.assertTrue(all(product.id > page[-1].id for product in rest))
+
+    def test_stream_products(self):
+        """It should stream Products in id order"""
+        for product in ProductFactory.create_batch(5):
+            product.create()
+        streamed = list(pagination.stream(Product.query, batch_size=2))
+        ids = [product.id for product in streamed]
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(ids, sorted(ids))
+        rest = list(pagination.stream(Product.query, after=[ids[2]], batch_size=2))
+        self.assertEqual([product.id for product in rest], ids[3:])
+
+    def test_parse_sort(self):
+        """It should parse a sort specification"""
+        self.assertEqual(pagination.parse_sort(None), [("id", False)])
+        self.assertEqual(pagination.parse_sort("price,-name"), [("price", False), ("name", True), ("id", False)])
+        self.assertEqual(pagination.parse_sort("-id"), [("id", True)])
+        self.assertRaises(DataValidationError, pagination.parse_sort, "description")
+
+    def test_parse_sort_rank(self):
+        """It should only sort search results by rank"""
+        self.assertEqual(pagination.parse_sort(None, search=True), [("rank", True), ("id", False)])
+        self.assertEqual(pagination.parse_sort("price", search=True), [("price", False), ("id", False)])
+        self.assertRaises(DataValidationError, pagination.parse_sort, "rank")
+
+    def test_paginate_search_results(self):
+        """It should page through search results by rank"""
+        for name in ["Ham", "Hammer", "Hammock", "Sledgehammer", "Ham", "Wrench"]:
+            ProductFactory(name=name).create()
+        query = Product.search(Product.query, "ham")
+        rank = Product.search_rank("ham")
+        sort = pagination.parse_sort(None, search=True)
+        fields = ["id", "name", "rank"]
+        page, has_more = pagination.paginate(query, 2, sort=sort, fields=fields, rank=rank)
+        names = [row["name"] for row in page]
+        while has_more:
+            page, has_more = pagination.paginate(query, 2, pagination.sort_key(page[-1], sort), sort, fields, rank)
+            names.extend(row["name"] for row in page)
+        self.assertEqual(names[:2], ["Ham", "Ham"])
+        self.assertEqual(sorted(names[2:4]), ["Hammer", "Hammock"])
+        self.assertEqual(names[4:], ["Sledgehammer"])
+
+    def test_paginate_sorted_products(self):
+        """It should page through Products in sort order"""
+        for product in ProductFactory.create_batch(12):
+            product.create()
+        sort = pagination.parse_sort("category,-price")
+        expected = [product.id for product in pagination.keyset(Product.query, sort)]
+        ids = []
+        page, has_more = pagination.paginate(Product.query, 5, sort=sort)
+        ids.extend(product.id for product in page)
+        while has_more:
+            page, has_more = pagination.paginate(Product.query, 5, pagination.sort_key(page[-1], sort), sort)
+            ids.extend(product.id for product in page)
+        self.assertEqual(ids, expected)
+        # each category is one block, ordered by price within the block
+        ordered = pagination.keyset(Product.query, sort).all()
+        blocks = [product.category for index, product in enumerate(ordered)
+                  if index == 0 or product.category != ordered[index - 1].category]
+        self.assertEqual(len(blocks), len(set(blocks)))
+        for first, second in zip(ordered, ordered[1:]):
+            if first.category == second.category:
+                self.assertGreaterEqual(first.price, second.price)
+
+    def test_paginate_invalid_cursor(self):
+        """It should not page with a cursor that does not match the sort"""
+        sort = pagination.parse_sort("price")
+        self.assertRaises(DataValidationError, pagination.paginate, Product.query, 5, [1], sort)
+        self.assertRaises(DataValidationError, pagination.paginate, Product.query, 5, ["abc", 1], sort)
+        self.assertRaises(DataValidationError, pagination.paginate, Product.query, 5, [True])
+        sort = pagination.parse_sort("category")
+        self.assertRaises(DataValidationError, pagination.paginate, Product.query, 5, ["SPACESHIPS", 1], sort)
+
+    def test_serialize_rows(self):
+        """It should serialize rows the same way as Products"""
+        for product in ProductFactory.create_batch(3):
+            product.create()
+        rows = list(pagination.serialize_rows(pagination.keyset(Product.query)))
+        expected = [product.serialize() for product in pagination.keyset(Product.query)]
+        self.assertEqual(app.json.loads(app.json.dumps(rows)), expected)
+        page, has_more = pagination.paginate(Product.query, 2, fields=Product.FIELDS)
+        self.assertTrue(has_more)
+        self.assertEqual(page, rows[:2])
+        streamed = list(pagination.stream(Product.query, batch_size=2, fields=Product.FIELDS))
+        self.assertEqual(streamed, rows)
+
+    def test_find_fields(self):
+        """It should select only the requested fields of a Product"""
+        product = ProductFactory()
+        product.create()
+        fields = ["id", "name", "price"]
+        found = pagination.find_fields(product.id, fields)
+        self.assertEqual(found, {"id": product.id, "name": product.name, "price": product.price})
+        self.assertIsNone(pagination.find_fields(0, fields))
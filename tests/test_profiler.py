@@ -0,0 +1,57 @@
+"""
+Test cases for the Query Profiler
+"""
+from service import app
+from service.common import status
+from service.common.profiler import redact
+from tests.database import DatabaseTestCase
+from tests.factories import ProductFactory
+
+
+class TestProfiler(DatabaseTestCase):
+    """Test the SQL statement profiler"""
+
+    def setUp(self):
+        """Runs before each test"""
+        super().setUp()
+        self.client = app.test_client()
+        self.config = dict(app.config)
+
+    def tearDown(self):
+        """Runs after each test"""
+        app.config.update(self.config)
+        super().tearDown()
+
+    def test_redact(self):
+        """It should only keep the types of the parameters"""
+        self.assertEqual(redact({"name": "hat", "price": 1}), {"name": "str", "price": "int"})
+        self.assertEqual(redact(("hat", None)), ["str", "NoneType"])
+        self.assertEqual(redact([{"name": "hat"}]), [{"name": "str"}])
+
+    def test_server_timing(self):
+        """It should add the statement count and time to Server-Timing"""
+        response = self.client.get("/products")
+        self.assertNotIn("Server-Timing", response.headers)
+        app.config["SERVER_TIMING"] = True
+        response = self.client.get("/products")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertRegex(response.headers["Server-Timing"], r'^db;dur=[\d.]+;desc="[1-9]\d* queries", app;dur=[\d.]+$')
+
+    def test_slow_query_log(self):
+        """It should log slow statements without the values of their parameters"""
+        app.config["SLOW_QUERY_MS"] = 0
+        product = ProductFactory(name="Secret Hat")
+        with self.assertLogs(app.logger, level="WARNING") as logs:
+            response = self.client.post("/products", json=product.serialize())
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        inserts = [line for line in logs.output if "Slow SQL" in line and "INSERT" in line]
+        self.assertTrue(inserts)
+        self.assertIn("'str'", inserts[0])
+        self.assertNotIn("Secret Hat", " ".join(logs.output))
+
+    def test_query_count_warning(self):
+        """It should warn about requests that issue too many statements"""
+        app.config["QUERY_COUNT_WARN"] = 0
+        with self.assertLogs(app.logger, level="WARNING") as logs:
+            self.client.get("/products")
+        self.assertTrue([line for line in logs.output if "GET /products issued" in line])
@@ -0,0 +1,145 @@
+"""
+Test cases for the Read Replica routing
+
+Two SQLite files stand in for the read replicas. They start empty, like
+replicas that have not caught up yet, so a request that finds nothing
+was served by a replica.
+"""
+import tempfile
+from sqlalchemy import create_engine
+from service import app
+from service.common import status
+from service.common.replicas import STICKY_COOKIE, ReplicaPool, on_replica
+from service.models import Product, db
+from tests.database import DatabaseTestCase
+from tests.factories import ProductFactory
+
+BASE_URL = "/products"
+
+
+class TestReplicas(DatabaseTestCase):
+    """Test the routing of reads to the read replicas"""
+
+    def setUp(self):
+        """Runs before each test"""
+        super().setUp()
+        self.client = app.test_client()
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.replicas = [
+            create_engine(f"sqlite:///{self.directory.name}/replica_{index}.db") for index in range(2)
+        ]
+        for engine in self.replicas:
+            db.metadata.create_all(engine)
+        self.pool = ReplicaPool(self.replicas, retry_after=30)
+        self.original_pool = app.extensions["replicas"]
+        app.extensions["replicas"] = self.pool
+
+    def tearDown(self):
+        """Runs after each test"""
+        app.extensions["replicas"] = self.original_pool
+        super().tearDown()
+        for engine in self.replicas:
+            engine.dispose()
+        self.directory.cleanup()
+
+    def _replicate(self, product, engines=None):
+        """Copies a Product to the replicas"""
+        row = {column.name: getattr(product, column.name) for column in Product.__table__.columns}
+        for engine in engines or self.replicas:
+            with engine.begin() as connection:
+                connection.execute(Product.__table__.insert(), [row])
+
+    ######################################################################
+    #  T E S T   C A S E S
+    ######################################################################
+
+    def test_round_robin(self):
+        """It should take turns between the replicas"""
+        chosen = [self.pool.choose() for _ in range(4)]
+        self.assertEqual(chosen, self.replicas + self.replicas)
+
+    def test_eject(self):
+        """It should skip an ejected replica until its retry time is up"""
+        self.pool.eject(self.replicas[0])
+        self.assertEqual(self.pool.healthy(), [self.replicas[1]])
+        self.assertEqual([self.pool.choose() for _ in range(2)], [self.replicas[1]] * 2)
+        self.pool.eject(self.replicas[1])
+        self.assertIsNone(self.pool.choose())
+        self.pool.retry_after = 0
+        self.pool.eject(self.replicas[0])
+        self.assertEqual(self.pool.choose(), self.replicas[0])
+
+    def test_eject_unreachable_replica(self):
+        """It should eject a replica that cannot be connected to"""
+        unreachable = create_engine(f"sqlite:///{self.directory.name}/missing/replica.db")
+        pool = ReplicaPool([unreachable])
+        with self.assertRaises(Exception):
+            unreachable.connect()
+        self.assertEqual(pool.healthy(), [])
+        self.assertIsNone(pool.choose())
+
+    def test_retry_unreachable_replica(self):
+        """It should retry a read that found its replica down instead of failing it"""
+        product = ProductFactory()
+        product.create()
+        self._replicate(product)
+        unreachable = create_engine(f"sqlite:///{self.directory.name}/missing/replica.db")
+        app.extensions["replicas"] = ReplicaPool([unreachable, self.replicas[0]])
+        response = self.client.get(f"{BASE_URL}/{product.id}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(app.extensions["replicas"].healthy(), [self.replicas[0]])
+        # the primary answers when no replica is left
+        app.extensions["replicas"] = ReplicaPool([unreachable])
+        response = self.client.get(BASE_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.get_json()), 1)
+
+    def test_read_from_replica(self):
+        """It should serve the read-only endpoints from the replicas"""
+        product = ProductFactory()
+        product.create()
+        response = self.client.get(f"{BASE_URL}/{product.id}")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(BASE_URL).get_json(), [])
+        self._replicate(product)
+        response = self.client.get(f"{BASE_URL}/{product.id}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.get_json()["id"], product.id)
+        self.assertEqual(len(self.client.get(BASE_URL).get_json()), 1)
+        # a lagging replica must not fill the cache
+        self.assertIsNone(Product.cache.get(str(product.id)))
+        self.assertFalse(on_replica(db.session))
+
+    def test_read_your_writes(self):
+        """It should read from the primary after the client wrote"""
+        product = ProductFactory()
+        response = self.client.post(BASE_URL, json=product.serialize())
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn(f"{STICKY_COOKIE}=1", response.headers["Set-Cookie"])
+        product_id = response.get_json()["id"]
+        response = self.client.get(f"{BASE_URL}/{product_id}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # another client reads from the replicas, which do not have it yet
+        Product.cache.clear()
+        response = app.test_client().get(f"{BASE_URL}/{product_id}")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_writes_use_primary(self):
+        """It should not send writes or unmarked endpoints to the replicas"""
+        product = ProductFactory()
+        product.create()
+        self._replicate(product)
+        response = self.client.delete(f"{BASE_URL}/{product.id}")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertIsNone(Product.find(product.id))
+        with self.replicas[0].connect() as connection:
+            self.assertEqual(len(connection.execute(Product.__table__.select()).all()), 1)
+
+    def test_no_healthy_replica(self):
+        """It should read from the primary when every replica is ejected"""
+        product = ProductFactory()
+        product.create()
+        for engine in self.replicas:
+            self.pool.eject(engine)
+        response = self.client.get(f"{BASE_URL}/{product.id}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
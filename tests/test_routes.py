@@ -25,13 +25,21 @@ Test cases can be run with the following:
     nosetests --stop tests/test_service.py:TestProductService
 """
 import os
+import re
+import gzip
+import json
 import logging
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
 from unittest import TestCase
+from unittest.mock import patch
+from werkzeug.http import http_date
 from service.models import db, init_db, Product
 from tests.factories import ProductFactory
 from urllib.parse import quote_plus
 from service.common import status
+from service.common.cache import LRUCache
+from service.common.pagination import encode_cursor
 from service import app
 
 
@@ -71,8 +79,9 @@ class TestProductRoutes(TestCase):
     def setUp(self):
         """Runs before each test"""
         self.client = app.test_client()
-        db.session.query(Product).delete()  # clean up the last tests
+        db.session.query(Product).execution_options(include_deleted=True).delete()  # clean up the last tests
         db.session.commit()
+        Product.cache.clear()
 
     def tearDown(self):
         db.session.remove()
@@ -110,6 +119,27 @@ class TestProductRoutes(TestCase):
         data = response.get_json()
         self.assertEqual(data['message'], 'OK')
 
+    def test_readiness(self):
+        """It should only be ready when the database is"""
+        response = self.client.get("/health/ready")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.get_json()["message"], "OK")
+        with patch("service.routes.database_ready", return_value=False):
+            response = self.client.get("/health/ready")
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        # liveness does not depend on the database
+        with patch("service.routes.database_ready", return_value=False):
+            response = self.client.get("/health")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_pool_stats(self):
+        """It should report the connection pool utilization"""
+        response = self.client.get("/pool/stats")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.get_json()
+        self.assertIn("pool", data)
+        self.assertIn("checkedout", data)
+
     # ----------------------------------------------------------
     # TEST CREATE
     # ----------------------------------------------------------
@@ -146,6 +176,20 @@ class TestProductRoutes(TestCase):
         # self.assertEqual(new_product["available"], test_product.available)
         # self.assertEqual(new_product["category"], test_product.category.name)
 
+    def test_create_product_payload_logging(self):
+        """It should only log the posted payload when asked to"""
+        product = ProductFactory()
+        with self.assertLogs(app.logger, level="INFO") as logs:
+            self.client.post(BASE_URL, json=product.serialize())
+        self.assertFalse([line for line in logs.output if "Processing" in line])
+        app.config["LOG_PAYLOADS"] = True
+        try:
+            with self.assertLogs(app.logger, level="INFO") as logs:
+                self.client.post(BASE_URL, json=product.serialize())
+        finally:
+            app.config["LOG_PAYLOADS"] = False
+        self.assertTrue([line for line in logs.output if "Processing" in line])
+
     def test_create_product_with_no_name(self):
         """It should not Create a Product without a name"""
         product = self._create_products()[0]
@@ -169,6 +213,50 @@ class TestProductRoutes(TestCase):
     # ADD YOUR TEST CASES HERE
     #
 
+    def test_create_products_bulk(self):
+        """It should Create many Products in one request"""
+        test_products = ProductFactory.create_batch(5)
+        payload = [product.serialize() for product in test_products]
+        response = self.client.post(f"{BASE_URL}/bulk", json=payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        data = response.get_json()
+        self.assertEqual(data["errors"], [])
+        self.assertEqual(len(data["created"]), 5)
+        for product, created in zip(test_products, data["created"]):
+            self.assertIsNotNone(created["id"])
+            self.assertEqual(created["name"], product.name)
+            self.assertEqual(Decimal(created["price"]), product.price)
+        self.assertEqual(self.get_product_count(), 5)
+
+    def test_create_products_bulk_with_errors(self):
+        """It should Create the valid Products and report the invalid ones"""
+        payload = [product.serialize() for product in ProductFactory.create_batch(3)]
+        del payload[1]["name"]
+        payload.append({"name": "Bad", "description": "Bad", "price": "abc", "available": True, "category": "TOOLS"})
+        payload.append("not a product")
+        # the database would reject these for the whole chunk
+        payload.append(dict(payload[0], name="x" * 101))
+        payload.append(dict(payload[0], description="x" * 251))
+        payload.append(dict(payload[0], price="NaN"))
+        payload.append(dict(payload[0], price="Infinity"))
+        response = self.client.post(f"{BASE_URL}/bulk", json=payload)
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        data = response.get_json()
+        self.assertEqual(len(data["created"]), 2)
+        self.assertEqual([error["index"] for error in data["errors"]], [1, 3, 4, 5, 6, 7, 8])
+        self.assertIn("longer than 100 characters", data["errors"][3]["message"])
+        self.assertEqual(self.get_product_count(), 2)
+
+    def test_create_products_bulk_all_invalid(self):
+        """It should not Create Products when every item is invalid"""
+        response = self.client.post(f"{BASE_URL}/bulk", json=[{"name": "Hat"}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.get_json()["errors"]), 1)
+        response = self.client.post(f"{BASE_URL}/bulk", json={"name": "Hat"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(f"{BASE_URL}/bulk", json=[])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_get_product(self):
         """It should Get a single Product"""
         # get the id of a product
@@ -178,6 +266,126 @@ class TestProductRoutes(TestCase):
         data = response.get_json()
         self.assertEqual(data["name"], test_product.name)
 
+    def test_get_product_cached(self):
+        """It should serve repeated reads of a Product from the cache"""
+        test_product = self._create_products(1)[0]
+        hits = Product.cache.stats()["hits"]
+        queries = []
+        with patch.dict(app.config, {"SERVER_TIMING": True}):
+            for _ in range(3):
+                response = self.client.get(f"{BASE_URL}/{test_product.id}")
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                queries.append(re.search(r'"(\d+) queries"', response.headers["Server-Timing"]).group(1))
+        self.assertEqual(Product.cache.stats()["hits"], hits + 2)
+        # only the first read goes to the database
+        self.assertEqual(queries, ["1", "0", "0"])
+        response = self.client.get("/cache/stats")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.get_json()["hits"], hits + 2)
+
+    def test_update_invalidates_cache(self):
+        """It should not serve a stale Product after it is updated or deleted"""
+        test_product = self._create_products(1)[0]
+        response = self.client.get(f"{BASE_URL}/{test_product.id}")
+        data = response.get_json()
+        data["description"] = "changed"
+        response = self.client.put(f"{BASE_URL}/{test_product.id}", json=data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(f"{BASE_URL}/{test_product.id}")
+        self.assertEqual(response.get_json()["description"], "changed")
+        self.client.delete(f"{BASE_URL}/{test_product.id}")
+        response = self.client.get(f"{BASE_URL}/{test_product.id}")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_update_in_another_worker(self):
+        """It should drop a stale copy of another worker's cache when its update conflicts"""
+        test_product = self._create_products(1)[0]
+        other_worker = LRUCache()
+        with patch.object(Product, "cache", other_worker):
+            data = self.client.get(f"{BASE_URL}/{test_product.id}").get_json()
+        data["description"] = "changed"
+        response = self.client.put(f"{BASE_URL}/{test_product.id}", json=data, headers={"If-Match": '"v1"'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with patch.object(Product, "cache", other_worker):
+            # the other worker serves its cached copy until it finds out
+            response = self.client.get(f"{BASE_URL}/{test_product.id}")
+            self.assertEqual(response.headers["ETag"], '"v1"')
+            response = self.client.put(f"{BASE_URL}/{test_product.id}", json=data, headers={"If-Match": '"v1"'})
+            self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+            response = self.client.get(f"{BASE_URL}/{test_product.id}")
+            self.assertEqual(response.headers["ETag"], '"v2"')
+            self.assertEqual(response.get_json()["description"], "changed")
+
+    def test_get_product_conditional(self):
+        """It should return 304 when the client's copy of a Product is current"""
+        test_product = self._create_products(1)[0]
+        response = self.client.get(f"{BASE_URL}/{test_product.id}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response.headers["ETag"]
+        self.assertIn("Last-Modified", response.headers)
+        response = self.client.get(f"{BASE_URL}/{test_product.id}", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.headers["ETag"], etag)
+        self.assertEqual(len(response.data), 0)
+        # change the product and the tag should no longer match
+        data = self.client.get(f"{BASE_URL}/{test_product.id}").get_json()
+        data["description"] = "changed"
+        self.client.put(f"{BASE_URL}/{test_product.id}", json=data)
+        response = self.client.get(f"{BASE_URL}/{test_product.id}", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+    def test_get_product_if_modified_since(self):
+        """It should return 304 when a Product has not changed since a date"""
+        test_product = self._create_products(1)[0]
+        response = self.client.get(f"{BASE_URL}/{test_product.id}")
+        last_modified = response.headers["Last-Modified"]
+        response = self.client.get(f"{BASE_URL}/{test_product.id}", headers={"If-Modified-Since": last_modified})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(
+            f"{BASE_URL}/{test_product.id}", headers={"If-Modified-Since": "Sat, 01 Jan 2000 00:00:00 GMT"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_products_compressed(self):
+        """It should gzip a listing and still honor its ETag"""
+        self._create_products(20)
+        response = self.client.get(BASE_URL, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(len(json.loads(gzip.decompress(response.data))), 20)
+        etag = response.headers["ETag"]
+        self.assertTrue(etag.endswith('-gzip"'))
+        response = self.client.get(BASE_URL, headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_products_conditional(self):
+        """It should return 304 when the client's copy of a listing is current"""
+        products = self._create_products(3)
+        response = self.client.get(BASE_URL, query_string="limit=2")
+        etag = response.headers["ETag"]
+        response = self.client.get(BASE_URL, query_string="limit=2", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        # a different listing has a different tag
+        response = self.client.get(BASE_URL, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response.headers["ETag"]
+        self.client.delete(f"{BASE_URL}/{products[-1].id}")
+        response = self.client.get(BASE_URL, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.get_json()), 2)
+
+    def test_list_products_ignores_if_modified_since(self):
+        """It should not return 304 for a listing that changed by deleting its newest Product"""
+        self._create_products(1)
+        self.assertNotIn("Last-Modified", self.client.get(BASE_URL).headers)
+        newest = self._create_products(1)[0]
+        listed = http_date(datetime.now(timezone.utc) + timedelta(seconds=1))
+        self.client.delete(f"{BASE_URL}/{newest.id}")
+        response = self.client.get(BASE_URL, headers={"If-Modified-Since": listed})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.get_json()), 1)
+
     def test_get_product_list(self):
         """It should Get a list of Products"""
         self._create_products(5)
@@ -240,6 +448,297 @@ class TestProductRoutes(TestCase):
         for product in data:
             self.assertEqual(product["category"], category.name)
 
+    def test_query_by_multiple_filters(self):
+        """It should Query Products by category, availability and price at once"""
+        products = self._create_products(20)
+        category = products[0].category
+        expected = [
+            product for product in products
+            if product.category == category and product.available and product.price >= Decimal("500")
+        ]
+        response = self.client.get(
+            BASE_URL, query_string=f"category={category.name}&available=true&min_price=500"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.get_json()
+        self.assertEqual(len(data), len(expected))
+        for product in data:
+            self.assertEqual(product["category"], category.name)
+            self.assertEqual(product["available"], True)
+            self.assertGreaterEqual(Decimal(product["price"]), Decimal("500"))
+
+    def test_query_sorted_by_price(self):
+        """It should list Products sorted by price"""
+        self._create_products(10)
+        response = self.client.get(BASE_URL, query_string="sort=-price&max_price=1000")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        prices = [Decimal(product["price"]) for product in response.get_json()]
+        self.assertTrue(all(price <= Decimal("1000") for price in prices))
+        self.assertEqual(prices, sorted(prices, reverse=True))
+
+    def test_query_bad_filters(self):
+        """It should not list Products with invalid filters"""
+        for query_string in ("min_price=cheap", "sort=description", "category=SPACESHIPS"):
+            response = self.client.get(BASE_URL, query_string=query_string)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, query_string)
+
+    def test_list_products_paginated_sorted(self):
+        """It should page through Products in sort order"""
+        self._create_products(10)
+        expected = [product["id"] for product in self.client.get(BASE_URL, query_string="sort=name,-price").get_json()]
+        response = self.client.get(BASE_URL, query_string="sort=name,-price&limit=3")
+        ids = [product["id"] for product in response.get_json()]
+        while "Link" in response.headers:
+            response = self.client.get(self._next_link(response))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(product["id"] for product in response.get_json())
+        self.assertEqual(ids, expected)
+
+    def test_search_products(self):
+        """It should search Products and page through them by rank"""
+        for name in ["Sledgehammer", "Hammer", "Ham", "Wrench"]:
+            product = ProductFactory(name=name, description="Something")
+            response = self.client.post(BASE_URL, json=product.serialize())
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.get(BASE_URL, query_string="q=ham")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([product["name"] for product in response.get_json()], ["Ham", "Hammer", "Sledgehammer"])
+        response = self.client.get(BASE_URL, query_string="q=ham&limit=1&fields=name")
+        names = [product["name"] for product in response.get_json()]
+        while "Link" in response.headers:
+            response = self.client.get(self._next_link(response))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            names.extend(product["name"] for product in response.get_json())
+        self.assertEqual(names, ["Ham", "Hammer", "Sledgehammer"])
+        response = self.client.get(BASE_URL, query_string="sort=rank")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_products_paginated(self):
+        """It should page through Products with a cursor"""
+        products = self._create_products(5)
+        response = self.client.get(BASE_URL, query_string="limit=2")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [product["id"] for product in response.get_json()]
+        while "Link" in response.headers:
+            next_url = self._next_link(response)
+            response = self.client.get(next_url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.get_json()
+            self.assertLessEqual(len(data), 2)
+            ids.extend(product["id"] for product in data)
+        self.assertEqual(ids, sorted(product.id for product in products))
+
+    def test_list_products_paginated_with_filter(self):
+        """It should keep the filter when paging through Products"""
+        products = self._create_products(10)
+        category = products[0].category
+        expected = sorted(product.id for product in products if product.category == category)
+        response = self.client.get(BASE_URL, query_string=f"category={category.name}&limit=1")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [product["id"] for product in response.get_json()]
+        while "Link" in response.headers:
+            next_url = self._next_link(response)
+            self.assertIn(f"category={category.name}", next_url)
+            response = self.client.get(next_url)
+            data = response.get_json()
+            for product in data:
+                self.assertEqual(product["category"], category.name)
+            ids.extend(product["id"] for product in data)
+        self.assertEqual(ids, expected)
+
+    def test_list_products_limit_capped(self):
+        """It should cap the page size at the server maximum"""
+        self._create_products(3)
+        original = app.config["PAGE_SIZE_MAX"]
+        app.config["PAGE_SIZE_MAX"] = 2
+        try:
+            response = self.client.get(BASE_URL, query_string="limit=100")
+        finally:
+            app.config["PAGE_SIZE_MAX"] = original
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.get_json()), 2)
+        self.assertIn("limit=2", response.headers["Link"])
+
+    def test_list_products_paged_by_default(self):
+        """It should return the first page of Products when no limit is given"""
+        products = self._create_products(3)
+        with patch.dict(app.config, {"PAGE_SIZE_DEFAULT": 2}):
+            response = self.client.get(BASE_URL)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids = [product["id"] for product in response.get_json()]
+            self.assertEqual(len(ids), 2)
+            response = self.client.get(self._next_link(response))
+        ids.extend(product["id"] for product in response.get_json())
+        self.assertNotIn("Link", response.headers)
+        self.assertEqual(ids, sorted(product.id for product in products))
+
+    def test_list_products_bad_limit(self):
+        """It should not list Products with an invalid limit"""
+        response = self.client.get(BASE_URL, query_string="limit=foo")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(BASE_URL, query_string="limit=0")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_products_bad_cursor(self):
+        """It should not list Products with an invalid cursor"""
+        response = self.client.get(BASE_URL, query_string="cursor=not-a-cursor")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(BASE_URL, query_string=f"cursor={encode_cursor(['x'])}")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_stream_products(self):
+        """It should stream Products as NDJSON"""
+        products = self._create_products(5)
+        response = self.client.get(BASE_URL, query_string="stream=true")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        self.assertTrue(response.is_streamed)
+        lines = response.get_data(as_text=True).splitlines()
+        ids = [json.loads(line)["id"] for line in lines]
+        self.assertEqual(ids, sorted(product.id for product in products))
+
+    def test_stream_products_with_accept_header(self):
+        """It should stream filtered Products when NDJSON is accepted"""
+        products = self._create_products(10)
+        available_count = len([product for product in products if product.available])
+        response = self.client.get(
+            BASE_URL,
+            query_string="available=true",
+            headers={"Accept": "application/x-ndjson"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual(len(lines), available_count)
+        for line in lines:
+            self.assertEqual(json.loads(line)["available"], True)
+
+    def test_get_product_fields(self):
+        """It should Get only the requested fields of a Product"""
+        test_product = self._create_products(1)[0]
+        response = self.client.get(f"{BASE_URL}/{test_product.id}", query_string="fields=id,name,price")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.get_json()
+        self.assertEqual(set(data), {"id", "name", "price"})
+        self.assertEqual(data["name"], test_product.name)
+        self.assertEqual(Decimal(data["price"]), test_product.price)
+        response = self.client.get(f"{BASE_URL}/0", query_string="fields=id")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_products_fields(self):
+        """It should list only the requested fields of Products"""
+        self._create_products(5)
+        response = self.client.get(BASE_URL, query_string="fields=name,price&sort=-price&limit=2")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        pages = [response.get_json()]
+        while "Link" in response.headers:
+            response = self.client.get(self._next_link(response))
+            pages.append(response.get_json())
+        rows = [row for page in pages for row in page]
+        self.assertEqual(len(rows), 5)
+        for row in rows:
+            self.assertEqual(set(row), {"name", "price"})
+        prices = [Decimal(row["price"]) for row in rows]
+        self.assertEqual(prices, sorted(prices, reverse=True))
+        response = self.client.get(BASE_URL, query_string="fields=id&stream=true")
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual([set(json.loads(line)) for line in lines], [{"id"}] * 5)
+
+    def test_list_products_bad_fields(self):
+        """It should not list Products with unknown fields"""
+        response = self.client.get(BASE_URL, query_string="fields=id,secret")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_product_stats(self):
+        """It should return statistics for each Category"""
+        products = self._create_products(10)
+        response = self.client.get(f"{BASE_URL}/stats")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.get_json()
+        self.assertEqual(sum(row["count"] for row in data), 10)
+        self.assertEqual(sum(row["available"] for row in data), len([product for product in products if product.available]))
+        # a new product shows up in the cached statistics
+        with patch.dict(app.config, {"STATS_CACHED": True}):
+            self.client.get(f"{BASE_URL}/stats")
+            self._create_products(1)
+            response = self.client.get(f"{BASE_URL}/stats")
+            self.assertEqual(sum(row["count"] for row in response.get_json()), 11)
+            response = self.client.get(f"{BASE_URL}/stats", query_string="fresh=true")
+            self.assertEqual(sum(row["count"] for row in response.get_json()), 11)
+
+    def test_patch_product(self):
+        """It should change only the fields that are sent"""
+        product = self._create_products(1)[0]
+        response = self.client.patch(f"{BASE_URL}/{product.id}", json={"price": "12.50"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Decimal(response.get_json()["price"]), Decimal("12.50"))
+        self.assertEqual(response.get_json()["name"], product.name)
+        response = self.client.get(f"{BASE_URL}/{product.id}")
+        self.assertEqual(Decimal(response.get_json()["price"]), Decimal("12.50"))
+        response = self.client.patch(f"{BASE_URL}/{product.id}", json={"price": "cheap"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.patch(f"{BASE_URL}/0", json={"price": "1"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_update_product_if_match(self):
+        """It should only update the version of a Product in If-Match"""
+        product = self._create_products(1)[0]
+        response = self.client.get(f"{BASE_URL}/{product.id}")
+        etag = response.headers["ETag"]
+        self.assertEqual(etag, '"v1"')
+        data = response.get_json()
+        data["description"] = "first writer"
+        response = self.client.put(f"{BASE_URL}/{product.id}", json=data, headers={"If-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.headers["ETag"], '"v2"')
+        data["description"] = "second writer"
+        response = self.client.put(f"{BASE_URL}/{product.id}", json=data, headers={"If-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(response.get_json()["error"], "Precondition Failed")
+        response = self.client.patch(f"{BASE_URL}/{product.id}", json={"available": True}, headers={"If-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        # the tag of a compressed copy is the same version
+        response = self.client.patch(
+            f"{BASE_URL}/{product.id}", json={"available": True}, headers={"If-Match": '"v2-gzip"'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.headers["ETag"], '"v3"')
+        response = self.client.get(f"{BASE_URL}/{product.id}")
+        self.assertEqual(response.get_json()["description"], "first writer")
+        response = self.client.put(f"{BASE_URL}/{product.id}", json=data, headers={"If-Match": "*"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_patch_many_products(self):
+        """It should change many Products with one request"""
+        products = self._create_products(10)
+        category = products[0].category
+        expected = len([product for product in products if product.category == category])
+        response = self.client.patch(
+            BASE_URL, json={"category": category.name, "changes": {"available": False}}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.get_json()["updated"], expected)
+        response = self.client.get(BASE_URL, query_string=f"category={category.name}")
+        self.assertFalse([product for product in response.get_json() if product["available"]])
+        ids = [product.id for product in products[:3]]
+        response = self.client.patch(BASE_URL, json={"ids": ids, "changes": {"description": "On sale"}})
+        self.assertEqual(response.get_json()["updated"], 3)
+        for product_id in ids:
+            self.assertEqual(self.client.get(f"{BASE_URL}/{product_id}").get_json()["description"], "On sale")
+        for body in ({"ids": "1,2", "changes": {"available": True}}, {"available": "yes", "changes": {}}, []):
+            response = self.client.patch(BASE_URL, json=body)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_patch_every_product(self):
+        """It should only change every Product when asked to explicitly"""
+        self._create_products(3)
+        for body in ({"changes": {"available": False}}, {"all": "true", "changes": {"available": False}}):
+            response = self.client.patch(BASE_URL, json=body)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.patch(BASE_URL, json={"all": True, "changes": {"available": False}})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.get_json()["updated"], 3)
+
     def test_delete_product(self):
         """It should Delete a Product"""
         products = self._create_products(5)
@@ -254,6 +753,67 @@ class TestProductRoutes(TestCase):
         new_count = self.get_product_count()
         self.assertEqual(new_count, product_count - 1)
 
+    def test_product_changes(self):
+        """It should return the Products changed since a token"""
+        original = app.config["CHANGES_LAG"]
+        app.config["CHANGES_LAG"] = 0
+        try:
+            products = self._create_products(3)
+            self.client.delete(f"{BASE_URL}/{products[0].id}")
+            response = self.client.get(f"{BASE_URL}/changes", query_string={"limit": 2})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.get_json()
+            self.assertTrue(data["has_more"])
+            self.assertEqual([change["id"] for change in data["changes"]], [products[1].id, products[2].id])
+            response = self.client.get(f"{BASE_URL}/changes", query_string={"since": data["next"]})
+            data = response.get_json()
+            self.assertFalse(data["has_more"])
+            self.assertEqual(len(data["changes"]), 1)
+            self.assertEqual(data["changes"][0]["id"], products[0].id)
+            self.assertIsNotNone(data["changes"][0]["deleted_at"])
+            # nothing new, so the same token comes back
+            since = data["next"]
+            data = self.client.get(f"{BASE_URL}/changes", query_string={"since": since}).get_json()
+            self.assertEqual(data, {"changes": [], "next": since, "has_more": False})
+        finally:
+            app.config["CHANGES_LAG"] = original
+
+    def test_product_changes_bad_token(self):
+        """It should not return changes for an invalid token"""
+        response = self.client.get(f"{BASE_URL}/changes", query_string={"since": "not a token"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_delete_all_products(self):
+        """It should Delete all Products"""
+        self._create_products(5)
+        response = self.client.delete(BASE_URL)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.get_product_count(), 0)
+
+    def test_delete_all_products_by_category(self):
+        """It should Delete only the Products in a category"""
+        products = self._create_products(10)
+        category = products[0].category
+        remaining = len([product for product in products if product.category != category])
+        response = self.client.delete(BASE_URL, query_string=f"category={category.name}")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.get_product_count(), remaining)
+
+    def test_delete_all_products_bad_category(self):
+        """It should not Delete Products with an invalid category"""
+        response = self.client.delete(BASE_URL, query_string="category=SPACESHIPS")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_delete_all_products_bad_available(self):
+        """It should not Delete Products unless available is true or false"""
+        self._create_products(3)
+        for value in ("yes", "1", ""):
+            response = self.client.delete(BASE_URL, query_string={"available": value})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.get_product_count(), 3)
+        response = self.client.delete(BASE_URL, query_string="available=FALSE")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
     def test_update_product(self):
         """It should Update an existing Product"""
         # create a product to update
@@ -272,6 +832,12 @@ class TestProductRoutes(TestCase):
     # Utility functions
     ######################################################################
 
+    def _next_link(self, response):
+        """Returns the url of the next page from the Link header"""
+        match = re.match(r'<([^>]+)>; rel="next"', response.headers["Link"])
+        self.assertIsNotNone(match)
+        return match.group(1)
+
     def get_product_count(self):
         """save the current number of products"""
         response = self.client.get(BASE_URL)
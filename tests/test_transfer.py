@@ -0,0 +1,140 @@
+"""
+Test cases for the Catalog Import and Export
+"""
+import os
+import csv
+import json
+import tempfile
+from unittest.mock import patch
+from service import app
+from service.common import transfer
+from service.models import DataValidationError, Product
+from tests.database import DatabaseTestCase
+from tests.factories import ProductFactory
+
+
+class TestTransfer(DatabaseTestCase):
+    """Test the products-import and products-export commands"""
+
+    def setUp(self):
+        """Runs before each test"""
+        super().setUp()
+        self.runner = app.test_cli_runner()
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.checkpoint = self.path("progress.json")
+
+    def tearDown(self):
+        """Runs after each test"""
+        super().tearDown()
+        self.directory.cleanup()
+
+    def path(self, name):
+        """Returns the path of a file in the temporary directory"""
+        return os.path.join(self.directory.name, name)
+
+    def _create_products(self, count):
+        """Creates some Products and returns them in id order"""
+        products = ProductFactory.create_batch(count)
+        for product in products:
+            product.create()
+        return products
+
+    ######################################################################
+    #  T E S T   C A S E S
+    ######################################################################
+
+    def test_detect_format(self):
+        """It should take the format from the option or the file extension"""
+        self.assertEqual(transfer.detect_format("catalog.CSV"), "csv")
+        self.assertEqual(transfer.detect_format("catalog.jsonl"), "ndjson")
+        self.assertEqual(transfer.detect_format("catalog.txt", "ndjson"), "ndjson")
+        self.assertRaises(DataValidationError, transfer.detect_format, "catalog.xml")
+
+    def test_export_and_import_csv(self):
+        """It should export Products to CSV and import them again"""
+        products = self._create_products(5)
+        path = self.path("catalog.csv")
+        result = self.runner.invoke(args=["products-export", path, "--batch-size", "2"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Exported 5 Products", result.output)
+        with open(path, encoding="utf-8", newline="") as file:
+            rows = list(csv.reader(file))
+        self.assertEqual(rows[0], list(Product.FIELDS))
+        self.assertEqual(len(rows), 6)
+        Product.delete_all()
+        result = self.runner.invoke(args=["products-import", path, "--chunk-size", "2"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Imported 5 records", result.output)
+        imported = Product.query.order_by(Product.id).all()
+        self.assertEqual([product.name for product in imported], [product.name for product in products])
+        self.assertEqual([product.available for product in imported], [product.available for product in products])
+
+    def test_export_and_import_ndjson(self):
+        """It should export Products to NDJSON and import them again"""
+        products = self._create_products(3)
+        path = self.path("catalog.ndjson")
+        result = self.runner.invoke(args=["products-export", path])
+        self.assertEqual(result.exit_code, 0, result.output)
+        with open(path, encoding="utf-8") as file:
+            rows = [json.loads(line) for line in file]
+        self.assertEqual([row["id"] for row in rows], [product.id for product in products])
+        self.assertEqual(rows[0]["category"], products[0].category.name)
+        Product.delete_all()
+        result = self.runner.invoke(args=["products-import", path])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(len(Product.all()), 3)
+
+    def test_import_invalid_record(self):
+        """It should stop at an invalid record unless asked to skip it"""
+        path = self.path("catalog.ndjson")
+        good = ProductFactory().serialize()
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(json.dumps(good) + "\n")
+            file.write(json.dumps(dict(good, price="free")) + "\n\n")
+            file.write(json.dumps(good) + "\n")
+        result = self.runner.invoke(args=["products-import", path, "--chunk-size", "1", "--checkpoint", self.checkpoint])
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertIn("Record 2: Invalid price", result.output)
+        self.assertEqual(len(Product.all()), 1)
+        self.assertEqual(transfer.load_checkpoint(self.checkpoint), {"records": 1})
+        # resume after the record that was already imported
+        args = ["products-import", path, "--checkpoint", self.checkpoint, "--skip-invalid"]
+        result = self.runner.invoke(args=args)
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(len(Product.all()), 2)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_resume_export(self):
+        """It should resume an interrupted export from its checkpoint"""
+        products = self._create_products(4)
+        path = self.path("catalog.ndjson")
+        with patch.object(transfer, "clear_checkpoint"):
+            transfer.export_products(path, "ndjson", app.json.dumps, 2, self.checkpoint)
+        # pretend the export stopped after the first batch, partway through a line
+        with open(path, encoding="utf-8") as file:
+            first_batch = "".join(file.readlines()[:2])
+        transfer.save_checkpoint(
+            self.checkpoint, {"after": products[1].id, "offset": len(first_batch.encode("utf-8")), "records": 2}
+        )
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(first_batch + '{"id": ')
+        count = transfer.export_products(path, "ndjson", app.json.dumps, 2, self.checkpoint)
+        self.assertEqual(count, 4)
+        with open(path, encoding="utf-8") as file:
+            ids = [json.loads(line)["id"] for line in file]
+        self.assertEqual(ids, [product.id for product in products])
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_export_skips_deleted(self):
+        """It should not export deleted Products"""
+        products = self._create_products(2)
+        products[0].delete()
+        path = self.path("catalog.csv")
+        self.assertEqual(transfer.export_products(path, "csv", app.json.dumps), 1)
+
+    def test_unknown_format(self):
+        """It should reject a file it does not know the format of"""
+        path = self.path("catalog.xml")
+        result = self.runner.invoke(args=["products-export", path])
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertIn("Unknown file format", result.output)